@@ -4,8 +4,9 @@ from __future__ import print_function
 
 from versuchung.experiment import Experiment
 from versuchung.files import File
-from versuchung.execute import shell
+from versuchung.execute import shell, CommandFailed
 import os
+import json
 
 class SimpleExperiment(Experiment):
     def run(self):
@@ -15,24 +16,38 @@ class SimpleExperiment(Experiment):
         shell.track.disable()
         shell("echo I am silent")
         shell.track.enable()
-        shell("echo Can you hear me?")
+        shell("echo Can you hear me?; echo 100%% >&2")
+        try:
+            shell("exit 3")
+        except CommandFailed:
+            pass
 
 if __name__ == "__main__":
     import shutil
     experiment = SimpleExperiment()
     dirname = experiment()
 
-    assert os.path.exists(dirname + "/shell_0_time")
+    assert os.path.exists(dirname + "/shell_rusage.jsonl")
     assert os.path.exists(dirname + "/shell_0_stdout")
     assert os.path.exists(dirname + "/shell_0_stderr")
     assert os.path.exists(dirname + "/shell_1_stdout")
     assert os.path.exists(dirname + "/shell_2_stdout")
-    assert not os.path.exists(dirname + "/shell_3_stdout")
+    assert not os.path.exists(dirname + "/shell_4_stdout")
 
     with open(dirname + "/shell_2_stdout") as fd:
         assert fd.read() == "Can you hear me?\n"
+    with open(dirname + "/shell_2_stderr") as fd:
+        assert fd.read() == "100%\n"
+
+    with open(dirname + "/shell_rusage.jsonl") as fd:
+        records = [json.loads(x) for x in fd]
+    assert [x["index"] for x in records] == [0, 1, 2, 3]
+    assert records[0]["command"] == "echo 1"
+    assert records[3]["returncode"] == 3
+    for record in records:
+        assert record["wall_time"] >= 0
+        assert record["max_rss"] > 0
 
     if dirname:
         shutil.rmtree(dirname)
     print("success")
-
@@ -0,0 +1,86 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.execute import ashell, ashell_failok, CommandFailed
+from versuchung.tools import Advice
+
+import asyncio
+import time
+
+class AdviceRecorder(Advice):
+    def __init__(self):
+        Advice.__init__(self, "versuchung.execute.ashell")
+        self.seen = []
+
+    async def around(self, func, args, kwargs):
+        ret = await func(args, kwargs)
+        self.seen.append(("around", ret))
+        return ret
+
+    def after(self, ret):
+        self.seen.append(("after", ret))
+        return ret
+
+class AsyncExperiment(Experiment):
+    def run(self):
+        asyncio.run(self.orchestrate())
+
+    async def orchestrate(self):
+        start = time.time()
+        results = await asyncio.gather(*[ashell("sleep 0.5; echo %s", str(i))
+                                         for i in range(20)])
+        assert time.time() - start < 5
+        assert results == [([str(i)], 0) for i in range(20)]
+
+        assert (['2 23'], 0) == await ashell("echo %(foo)s %(bar)s", {"foo": "2", "bar": "23"})
+
+        try:
+            await ashell("/bin/false")
+            assert False
+        except CommandFailed:
+            pass
+        assert ([""], 1) == await ashell_failok("/bin/false")
+
+        lines = []
+        assert ([], 0) == await ashell("seq 1 3", stream=lines.append)
+        assert lines == ["1", "2", "3"]
+
+        # Lines longer than the asyncio stream limit
+        (out, _) = await ashell("head -c 200000 /dev/zero | tr '\\0' x; echo; echo end")
+        assert out == ["x" * 200000, "end"]
+
+        # Advices see the awaited result
+        assert asyncio.iscoroutinefunction(ashell)
+        recorder = AdviceRecorder()
+        recorder.enable()
+        try:
+            assert (["a"], 0) == await ashell("echo a")
+        finally:
+            recorder.disable()
+        assert recorder.seen == [("around", (["a"], 0)), ("after", (["a"], 0))]
+
+        # Timeouts kill the whole process group
+        start = time.time()
+        try:
+            await ashell("sleep 10 & sleep 10", timeout=0.5)
+            assert False
+        except asyncio.TimeoutError:
+            pass
+        assert time.time() - start < 5
+
+        task = asyncio.ensure_future(ashell("sleep 10"))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+            assert False
+        except asyncio.CancelledError:
+            pass
+
+if __name__ == "__main__":
+    import shutil
+    experiment = AsyncExperiment()
+    dirname = experiment()
+    if dirname:
+        shutil.rmtree(dirname)
+    print("success")
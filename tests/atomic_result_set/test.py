@@ -0,0 +1,81 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.types import String
+from versuchung.files import File
+from versuchung.search import search_experiment_results
+import os
+import json
+
+class AtomicExperiment(Experiment):
+    inputs = {"mode": String("ok")}
+    outputs = {"data": File("data")}
+
+    def run(self):
+        # Nobody sees the result set while it is written, but an
+        # older result set stays complete
+        final = os.path.join(startup, self.experiment_identifier)
+        assert self.path != final
+        if os.path.exists(final):
+            with open(os.path.join(final, "metadata")) as fd:
+                assert "date-end" in json.load(fd)
+        assert os.path.basename(self.path).startswith("." + self.experiment_identifier)
+        self.data.value = self.mode.value
+        if self.mode.value == "fail":
+            raise RuntimeError("expected failure")
+        if self.mode.value == "broken":
+            raise KeyError("expected failure")
+
+startup = os.path.abspath(os.curdir)
+
+if __name__ == "__main__":
+    import shutil
+    e = AtomicExperiment()
+    r1 = e(mode="first")
+    assert e.path == os.path.abspath(r1)
+    assert open(os.path.join(r1, "data")).read() == "first"
+    assert "date-end" in e.metadata
+
+    # Running again replaces the result set as a whole
+    r2 = AtomicExperiment()(mode="first")
+    assert r1 == r2
+    assert os.path.exists(os.path.join(r1, "metadata"))
+
+    # A failing run leaves only its hidden staging directory
+    try:
+        AtomicExperiment()(mode="fail")
+        assert False
+    except RuntimeError:
+        pass
+    staging = [d for d in os.listdir(".") if d.startswith(".AtomicExperiment-")]
+    assert len(staging) == 1
+    assert len(search_experiment_results(AtomicExperiment, ".")) == 1
+
+    # No leftovers of the replaced result set
+    assert [d for d in os.listdir(".") if "old" in d] == []
+
+    # The next run of the same identifier removes the stale staging
+    # directory, but keeps its own
+    try:
+        AtomicExperiment()(mode="fail")
+        assert False
+    except RuntimeError:
+        pass
+    again = [d for d in os.listdir(".") if d.startswith(".AtomicExperiment-")]
+    assert len(again) == 1 and again != staging
+
+    # Also after other errors, the staging directory is unlocked
+    for i in range(2):
+        try:
+            AtomicExperiment()(mode="broken")
+            assert False
+        except KeyError:
+            pass
+    broken = [d for d in os.listdir(".") if d.startswith(".AtomicExperiment-")
+              and d not in again]
+    assert len(broken) == 1
+
+    shutil.rmtree(r1)
+    shutil.rmtree(again[0])
+    shutil.rmtree(broken[0])
+    print("success")
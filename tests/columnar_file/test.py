@@ -0,0 +1,70 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.files import ColumnarFile, CSV_File
+
+class ProducerExperiment(Experiment):
+    outputs = {"trace": ColumnarFile("trace", [("time", "f8"), ("latency", "u4")]),
+               "inferred": ColumnarFile("inferred"),
+               "objects": ColumnarFile("objects"),
+               "csv": CSV_File("trace.csv")}
+
+    def run(self):
+        self.trace.append({"time": [0.5, 1.0], "latency": [10, 20]})
+        self.trace.append([(1.5, 30), (2.0, 40)])
+        assert self.trace.rows == 4
+        assert list(self.trace["latency"]) == [10, 20, 30, 40]
+
+        self.inferred.append({"a": [1, 2], "b": ["x", "yy"]})
+        # Neither objects nor truncated strings are stored
+        for (f, batch) in [(self.objects, {"a": [1.5, None]}),
+                           (self.inferred, {"a": [3], "b": ["abcdefgh"]}),
+                           (self.inferred, {"a": [1.5], "b": ["z"]})]:
+            try:
+                f.append(batch)
+                assert False, "%s must be rejected" % batch
+            except ValueError:
+                pass
+        self.inferred.append({"a": [3], "b": ["zz"]})
+        self.trace.to_csv(self.csv)
+
+class ConsumerExperiment(Experiment):
+    inputs = {"data": ProducerExperiment()}
+    outputs = {"converted": ColumnarFile("converted", [("time", "f4"), ("latency", "i8")]),
+               "narrow": ColumnarFile("narrow", [("time", "U2"), ("latency", "u4")])}
+
+    def run(self):
+        import numpy
+        trace = self.data.trace
+        assert trace.names == ["time", "latency"]
+        assert isinstance(trace["time"], numpy.memmap)
+        assert trace["latency"].dtype == numpy.uint32
+        assert trace["latency"].sum() == 100
+        assert trace.rows == 4
+
+        assert list(self.data.inferred["b"]) == ["x", "yy", "zz"]
+        assert self.data.csv.value[0] == ["0.5", "10"]
+
+        self.converted.from_csv(self.data.csv)
+        assert self.converted["latency"].dtype == numpy.int64
+        assert list(self.converted["time"]) == [0.5, 1.0, 1.5, 2.0]
+        # The csv text "0.5" does not fit into two characters
+        try:
+            self.narrow.from_csv(self.data.csv)
+            assert False, "strings must not be truncated"
+        except ValueError:
+            pass
+
+if __name__ == "__main__":
+    import shutil, sys
+    try:
+        import numpy
+    except ImportError:
+        print("skipped")
+        sys.exit(0)
+    r1 = ProducerExperiment()([])
+    r2 = ConsumerExperiment()(data=r1)
+
+    shutil.rmtree(r1)
+    shutil.rmtree(r2)
+    print("success")
@@ -0,0 +1,81 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.archives import GzipFile, ZstdFile, compressed_file_types
+from versuchung.files import Directory
+import gzip
+import os
+
+compressions = ["gzip"]
+for (name, module) in [("zstd", "zstandard"), ("lz4", "lz4.frame")]:
+    try:
+        __import__(module)
+        compressions.append(name)
+    except ImportError:
+        pass
+
+class CompressedOutput(Experiment):
+    outputs = {"trace": GzipFile("trace.gz", level=1, streaming=True),
+               "small": GzipFile("small.gz"),
+               "stored": GzipFile("stored.gz", level=0),
+               "traces": Directory("traces")}
+
+    def run(self):
+        for i in range(10000):
+            self.trace.write("line %d\n" % i, append=True)
+        try:
+            self.trace.value
+            assert False, "open compressed streams cannot be read"
+        except RuntimeError:
+            pass
+        self.small.value = "a\nb\n"
+        self.stored.value = "a" * 10000
+
+        for c in compressions:
+            name = "trace" + compressed_file_types[c].extension
+            f = self.traces.new_file(name, compressed=c, streaming=True)
+            for i in range(1000):
+                f.write("%s %d\n" % (c, i), append=True)
+        if "zstd" not in compressions:
+            try:
+                ZstdFile("x.zst").before_write("x")
+                assert False
+            except RuntimeError:
+                pass
+
+class CompressedInput(Experiment):
+    inputs = {"data": CompressedOutput()}
+
+    def run(self):
+        trace = self.data.trace
+        lines = list(trace.iter_lines())
+        assert len(lines) == 10000 and lines[-1] == "line 9999"
+        assert next(trace.iter_lines(encoding=None)) == b"line 0"
+        assert trace.value.startswith("line 0\nline 1\n")
+        # Streaming inputs are read only once
+        assert trace.value is trace.value
+        # Decompressed into the tmp directory
+        assert self.tmp_directory.path in trace.path
+        assert open(trace.path).read() == trace.value
+        assert self.data.small.value == "a\nb\n"
+
+        for (c, f) in zip(sorted(compressions, key=lambda c: compressed_file_types[c].extension),
+                          sorted(self.data.traces, key=lambda f: f.original_path)):
+            assert type(f) == compressed_file_types[c]
+            assert len(list(f.iter_lines())) == 1000
+            assert f.value.startswith(c + " 0\n")
+
+if __name__ == "__main__":
+    import shutil
+    out = CompressedOutput()
+    r1 = out([])
+    assert gzip.open(out.trace.original_path).read().startswith(b"line 0\n")
+    # The streaming writer compresses across chunks
+    assert os.path.getsize(out.trace.original_path) < 30000
+    # Level 0 only stores the data
+    assert os.path.getsize(out.stored.original_path) > 10000
+
+    r2 = CompressedInput()(data=r1)
+    shutil.rmtree(r1)
+    shutil.rmtree(r2)
+    print("success")
@@ -0,0 +1,65 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.files import CSV_File
+from versuchung.execute import MachineMonitor
+
+class CSVExperiment(Experiment):
+    outputs = {"csv": CSV_File("csv_output"),
+               "ragged": CSV_File("ragged"),
+               "ps": MachineMonitor("monitor")}
+
+    def run(self):
+        self.csv.value.append([1, 1.5, "a"])
+        self.csv.value.append([2, 2.5, "b"])
+        # Rows that are only in memory are also converted
+        assert list(self.csv.columns()[1]) == [1.5, 2.5]
+        self.ragged.value = [[1, 2], [3]]
+
+class AnalysisExperiment(Experiment):
+    inputs = {"data": CSVExperiment()}
+
+    def run(self):
+        import numpy
+        cols = self.data.csv.columns(["id", "value", "name"], dtypes={"id": int})
+        assert cols["id"].dtype == int and list(cols["id"]) == [1, 2]
+        assert list(cols["value"]) == [1.5, 2.5]
+        assert list(cols["name"]) == ["a", "b"]
+
+        df = self.data.csv.columns(["id", "value", "name"], dataframe=True)
+        assert df["value"].sum() == 4.0
+
+        try:
+            self.data.ragged.columns(["a", "b"])
+            assert False, "ragged rows must not be truncated"
+        except ValueError:
+            pass
+
+        ps = self.data.ps
+        # Overwrite the samples: 10 samples per second, 3 seconds
+        ps.value = [[100 + i / 10.0, i] + [0] * (len(ps.sample_keys) - 2)
+                    for i in range(30)]
+        ps.flush()
+        a = ps.extract_array(["time", "cpu_percentage"])
+        assert a.shape == (30, 2)
+
+        r = ps.resample(["cpu_percentage"], window=1000)
+        assert r.shape == (3, 2)
+        assert list(r[:, 1]) == [4.5, 14.5, 24.5]
+        assert list(ps.resample(["cpu_percentage"], aggregate="max")[:, 1]) == [9, 19, 29]
+        assert list(ps.resample(["cpu_percentage"], aggregate=50)[:, 1]) == [4.5, 14.5, 24.5]
+
+if __name__ == "__main__":
+    import shutil, sys
+    try:
+        import numpy, pandas, psutil
+    except ImportError:
+        print("skipped")
+        sys.exit(0)
+
+    r1 = CSVExperiment()([])
+    r2 = AnalysisExperiment()(data=r1)
+
+    shutil.rmtree(r1)
+    shutil.rmtree(r2)
+    print("success")
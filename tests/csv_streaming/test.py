@@ -0,0 +1,36 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.files import CSV_File
+
+class CSVExperiment(Experiment):
+    outputs = {"csv": CSV_File("csv_output", streaming=True),
+               "semicolon": CSV_File("semicolon", delimiter=";")}
+
+    def run(self):
+        for i in range(1000):
+            self.csv.append([i, i * 0.5, "x"])
+        assert len(list(self.csv.iter_rows())) == 1000
+        self.semicolon.append([1, 2])
+
+class ReadExperiment(Experiment):
+    inputs = {"data": CSVExperiment()}
+
+    def run(self):
+        rows = self.data.csv.iter_rows([1, 0], [float, int])
+        assert next(rows) == [0.0, 0]
+        assert next(rows) == [0.5, 1]
+        assert sum([x[0] for x in self.data.csv.iter_rows([0], int)]) == sum(range(1000))
+        assert self.data.csv.value[999] == ["999", "499.5", "x"]
+        assert self.data.semicolon.value == [["1", "2"]]
+
+if __name__ == "__main__":
+    import shutil
+    r1 = CSVExperiment()([])
+    with open(r1 + "/semicolon") as fd:
+        assert fd.read().strip() == "1;2"
+    r2 = ReadExperiment()(data=r1)
+
+    shutil.rmtree(r1)
+    shutil.rmtree(r2)
+    print("success")
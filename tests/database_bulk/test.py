@@ -0,0 +1,54 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.database   import Database, Table
+import os
+
+class BulkExperiment(Experiment):
+    outputs = {"samples": Table([("run", "integer"), ("time", "real")]),
+               "buffered": Table([("run", "integer"), "label"], batch_size=1000,
+                                 db=Database(path="buffered.db"))}
+
+    def run(self):
+        self.samples.insert_many((i, i * 0.5) for i in range(50000))
+        self.samples.insert_many([{"run": -1, "time": 0.0}])
+        self.samples.insert(run=-2, time=1.0)
+
+        for i in range(2500):
+            self.buffered.insert(run=i, label="x%d" % i)
+        # Reading flushes the buffer
+        assert len(self.buffered.value[1]) == 2500
+
+        self.buffered.insert(run=2500, label="dropped")
+        self.buffered.clear()
+        for i in range(10):
+            # Stays in the buffer until the experiment ends
+            self.buffered.insert({"run": i, "label": "last"})
+
+class ReadExperiment(Experiment):
+    inputs = {"bulk": BulkExperiment()}
+
+    def run(self):
+        (cols, rows) = self.bulk.samples.value
+        assert cols == ("run", "time")
+        assert len(rows) == 50002
+        assert rows[2] == (2, 1.0)
+        assert rows[-1] == (-2, 1.0)
+
+        (cols, rows) = self.bulk.buffered.value
+        assert len(rows) == 10
+        assert rows[0] == (0, "last")
+
+
+if __name__ == "__main__":
+    import shutil
+    e1 = BulkExperiment()
+    r1 = e1([])
+    e2 = ReadExperiment()
+    r2 = e2(bulk=os.path.abspath(r1))
+
+    shutil.rmtree(r1)
+    shutil.rmtree(r2)
+    print("success")
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+
+from versuchung.database import Database_SQlite_Merger
+import sqlite3
+import shutil
+import os
+
+def create_source(path, index):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE metadata (experiment text, metadata text, "
+                 "UNIQUE(experiment) ON CONFLICT REPLACE)")
+    conn.execute("CREATE TABLE Exp__samples (experiment text, run integer, time real)")
+    conn.execute("CREATE TABLE Exp__keydict (experiment text, key text, value text, "
+                 "UNIQUE(key) ON CONFLICT REPLACE)")
+    experiment = "Exp-%032d" % index
+    conn.execute("INSERT INTO metadata VALUES (?, ?)", (experiment, "{}"))
+    conn.executemany("INSERT INTO Exp__samples VALUES (?, ?, ?)",
+                     [(experiment, i, i * 0.5) for i in range(100)])
+    # An identical row in the same source is only merged once
+    conn.execute("INSERT INTO Exp__samples VALUES (?, ?, ?)", (experiment, 0, 0.0))
+    # ... and so is an identical row in all sources
+    conn.execute("INSERT INTO Exp__samples VALUES (?, ?, ?)", ("shared", 0, None))
+    conn.execute("INSERT INTO Exp__keydict VALUES (?, ?, ?)", (experiment, "last", str(index)))
+    conn.execute("INSERT INTO Exp__keydict VALUES (?, ?, ?)", (experiment, "k%d" % index, "v"))
+    conn.commit()
+    conn.close()
+
+def contents(path):
+    conn = sqlite3.connect(path)
+    ret = {}
+    for table in ["metadata", "Exp__samples", "Exp__keydict", "TableDict"]:
+        ret[table] = sorted(conn.execute("SELECT * FROM " + table).fetchall())
+    conn.close()
+    return ret
+
+if __name__ == "__main__":
+    os.mkdir("sources")
+    sources = []
+    for i in range(25):
+        sources.append(os.path.join("sources", "%d.db" % i))
+        create_source(sources[-1], i)
+
+    progress = []
+    merger = Database_SQlite_Merger("sequential.db", sources, logging=False,
+                                    progress=lambda done, total: progress.append((done, total)))
+    merger.merge()
+    assert progress == [(8, 25), (16, 25), (24, 25), (25, 25)], progress
+
+    seq = contents("sequential.db")
+    assert len(seq["metadata"]) == 25
+    assert len(seq["Exp__samples"]) == 25 * 100 + 1
+    assert len(seq["Exp__keydict"]) == 26
+    assert ("Exp-%032d" % 24, "last", "24") in seq["Exp__keydict"]
+    assert len(seq["TableDict"]) == 26
+
+    merger = Database_SQlite_Merger("parallel.db", sources, logging=False,
+                                    attach_batch=3, jobs=4)
+    merger.merge()
+    assert contents("parallel.db") == seq
+    assert [x for x in os.listdir(".") if x.startswith("merge-")] == []
+
+    # Merging again with update does not duplicate keyed rows
+    Database_SQlite_Merger("parallel.db", sources[:2], logging=False).merge(update=True)
+    par = contents("parallel.db")
+    assert par["metadata"] == seq["metadata"]
+    assert len(par["Exp__keydict"]) == 26
+    assert par["Exp__samples"] == seq["Exp__samples"]
+
+    shutil.rmtree("sources")
+    os.unlink("sequential.db")
+    os.unlink("parallel.db")
+    print("success")
@@ -0,0 +1,56 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.database   import Database, Table
+import sqlite3
+import os
+
+def query_plan(handle, query, *args):
+    return " ".join(str(x) for x in handle.execute("EXPLAIN QUERY PLAN " + query, *args).fetchall())
+
+class PragmaExperiment(Experiment):
+    outputs = {"samples": Table(["benchmark", ("run", "integer")],
+                                indexes=["run", ("benchmark", "run")],
+                                db=Database(path="fast.db", pragmas="performance")),
+               "keyed": Table(["key"], keys=["experiment", "key"])}
+
+    def run(self):
+        db = self.samples.database
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.execute("PRAGMA synchronous").fetchone()[0] == 1
+        self.samples.insert_many(("bench%d" % (i % 10), i) for i in range(1000))
+
+        indexes = [x[0] for x in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        assert "PragmaExperiment__samples__experiment" in indexes
+        assert "PragmaExperiment__samples__run" in indexes
+        assert "PragmaExperiment__samples__benchmark_run" in indexes
+        assert "USING INDEX" in query_plan(db, "SELECT * FROM PragmaExperiment__samples WHERE experiment = ?", "x")
+        # The unique key already covers the experiment column
+        indexes = [x[0] for x in self.keyed.database.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'PragmaExperiment__keyed'")]
+        assert "PragmaExperiment__keyed__experiment" not in indexes
+
+class ReadExperiment(Experiment):
+    inputs = {"data": PragmaExperiment()}
+
+    def run(self):
+        assert len(self.data.samples.value[1]) == 1000
+
+if __name__ == "__main__":
+    import shutil
+    e1 = PragmaExperiment()
+    r1 = e1([])
+    path = e1.samples.database.path
+    # The published database is a single file with a rollback journal
+    assert not os.path.exists(path + "-wal")
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+
+    r2 = ReadExperiment()(data=os.path.abspath(r1))
+
+    shutil.rmtree(r1)
+    shutil.rmtree(r2)
+    print("success")
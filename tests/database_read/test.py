@@ -0,0 +1,69 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.database   import Table, TableDict
+import os
+
+class Producer(Experiment):
+    outputs = {"samples": Table(["benchmark", ("run", "integer"), ("time", "real"), ("note", "integer")]),
+               "lookup": TableDict()}
+
+    def run(self):
+        self.samples.insert_many(("bench%d" % (i % 3), i, i / 4.0, None if i == 7 else i)
+                                 for i in range(3000))
+        self.lookup["a"] = "b"
+
+class Consumer(Experiment):
+    inputs = {"data": Producer()}
+
+    def run(self):
+        samples = self.data.samples
+        rows = samples.iter_rows(fetch_size=100)
+        assert next(rows) == ("bench0", 0, 0.0, 0)
+        assert len(list(rows)) == 2999
+
+        rows = list(samples.iter_rows(["time", "run"], "benchmark = ? AND run < ?", ["bench1", 10]))
+        assert rows == [(0.25, 1), (1.0, 4), (1.75, 7)], rows
+
+        try:
+            list(samples.iter_rows(["run; DROP TABLE x"]))
+            assert False
+        except AssertionError as e:
+            assert "Unknown column" in str(e)
+
+        (cols, rows) = samples.value
+        assert cols == ("benchmark", "run", "time", "note")
+        assert len(rows) == 3000
+
+        assert dict(self.data.lookup) == {"a": "b"}
+
+        try:
+            import numpy
+        except ImportError:
+            return
+        arrays = samples.to_numpy(["run", "time", "benchmark", "note"], "run >= ?", [1000])
+        assert arrays["run"].dtype == numpy.int64 and len(arrays["run"]) == 2000
+        assert arrays["time"].dtype == numpy.float64
+        assert arrays["time"].sum() == sum(i / 4.0 for i in range(1000, 3000))
+        assert arrays["benchmark"][0] == "bench1"
+        assert len(samples.to_numpy(["note"], "run < 10")["note"]) == 10
+
+        try:
+            import pandas
+        except ImportError:
+            return
+        df = samples.to_dataframe()
+        assert list(df.columns) == ["benchmark", "run", "time", "note"]
+        assert len(df) == 3000
+        assert df.groupby("benchmark")["run"].count()["bench2"] == 1000
+
+if __name__ == "__main__":
+    import shutil
+    r1 = Producer()([])
+    r2 = Consumer()(data=os.path.abspath(r1))
+
+    shutil.rmtree(r1)
+    shutil.rmtree(r2)
+    print("success")
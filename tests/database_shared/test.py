@@ -0,0 +1,59 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.types      import Integer
+from versuchung.database   import Database, Table, TableDict
+import sqlite3
+import os
+
+shared = os.path.abspath("shared.db")
+
+class Writer(Experiment):
+    inputs = {"point": Integer(0)}
+    outputs = {"samples": Table([("point", "integer"), ("i", "integer")],
+                                indexes=["point"],
+                                db=Database(path=shared, shared=True, timeout=1, retries=20)),
+               "info": TableDict(db=Database(path=shared, shared=True))}
+
+    def run(self):
+        point = self.point.value
+        # Writing into the shard does not lock the shared database
+        for i in range(200):
+            self.samples.insert(point=point, i=i)
+        self.info["point"] = str(point)
+        assert len(self.samples.value[1]) == 200
+
+class Reader(Experiment):
+    inputs = {"writer": Writer()}
+
+    def run(self):
+        assert len(self.writer.samples.value[1]) == 200
+        assert self.writer.info["point"] == "3"
+
+if __name__ == "__main__":
+    import shutil
+    results = Writer().sweep({"point": list(range(8))}, jobs=4)
+    assert None not in results
+
+    conn = sqlite3.connect(shared)
+    count = lambda q: conn.execute(q).fetchone()[0]
+    assert count("SELECT count(*) FROM Writer__samples") == 8 * 200
+    assert count("SELECT count(DISTINCT experiment) FROM Writer__samples") == 8
+    assert count("SELECT count(*) FROM metadata") == 8
+    # The keys of a TableDict are unique across experiments
+    assert count("SELECT count(*) FROM Writer__info") == 1
+    assert count("SELECT count(*) FROM sqlite_master WHERE name = 'Writer__samples__point'") == 1
+
+    # The shared database stays writable, a second run replaces its rows
+    r = Writer()(point=3)
+    assert count("SELECT count(*) FROM Writer__samples") == 8 * 200
+    conn.close()
+
+    r2 = Reader()(writer=os.path.abspath(r))
+
+    for d in set(results + [r, r2]):
+        shutil.rmtree(d)
+    os.unlink(shared)
+    print("success")
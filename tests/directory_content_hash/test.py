@@ -0,0 +1,56 @@
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+os.environ["XDG_CACHE_HOME"] = tempfile.mkdtemp()
+
+from versuchung.experiment import Experiment
+from versuchung.files import Directory, tree_checksum
+
+class HashedInput(Experiment):
+    inputs = {"src": Directory("src", filename_filter="*.c", content_hash=True),
+              "plain": Directory("src")}
+
+    def run(self):
+        assert "a.c" in self.src.value
+
+def write(path, content):
+    with open(path, "w") as fd:
+        fd.write(content)
+
+if __name__ == "__main__":
+    os.makedirs("src/sub.c")
+    write("src/a.c", "int a;")
+    write("src/README", "readme")
+    write("src/sub.c/b.h", "int b;")
+    os.symlink("sub.c", "src/link.c")
+
+    r1 = HashedInput()([])
+
+    # Files that do not match the filter are ignored
+    write("src/README", "changed")
+    r2 = HashedInput()([])
+    assert r1 == r2
+
+    # Changes in a subtree change the digest
+    before = tree_checksum("src", filename_filter="*.c")
+    write("src/sub.c/b.h", "int bb;")
+    after = tree_checksum("src", filename_filter="*.c")
+    assert before != after
+    r3 = HashedInput()([])
+    assert r1 != r3
+
+    # Renaming a file changes the digest as well
+    os.rename("src/sub.c/b.h", "src/sub.c/c.h")
+    assert tree_checksum("src", filename_filter="*.c") != after
+
+    # The digest is independent of the parallelism
+    assert tree_checksum("src", jobs=1) == tree_checksum("src", jobs=8)
+
+    for r in set([r1, r3]):
+        shutil.rmtree(r)
+    shutil.rmtree("src")
+    shutil.rmtree(os.environ["XDG_CACHE_HOME"])
+    print("success")
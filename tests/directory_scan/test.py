@@ -0,0 +1,55 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.files import Directory, File
+from versuchung.archives import GzipFile
+import os
+
+class ScanExperiment(Experiment):
+    outputs = {"runs": Directory("runs"),
+               "logs": Directory("runs", filename_filter="run-1*")}
+
+    def run(self):
+        for i in range(20):
+            d = self.runs.new_directory("run-%d" % i)
+            d.new_file("out.log").value = "log %d" % i
+            d.new_file("data.csv").value = "a,b"
+        os.mkdir(os.path.join(self.runs.path, "run-3", "nested"))
+        self.runs.new_file("summary.gz", compressed=True).value = "x"
+        for i in range(5000):
+            self.runs.new_file("file-%d" % i)
+
+if __name__ == "__main__":
+    import shutil
+    experiment = ScanExperiment()
+    dirname = experiment([])
+
+    runs = Directory(experiment.runs.path)
+    entries = list(runs.scan())
+    assert len(entries) == 20 + 1 + 5000
+    assert len(runs.subobjects) == 0
+    kinds = dict((os.path.basename(x.original_path) if isinstance(x, File) else x.basename, type(x)) for x in entries)
+    assert kinds["run-0"] == Directory
+    assert kinds["summary.gz"] == GzipFile
+    assert kinds["file-0"] == File
+
+    logs = list(runs.scan("*.log", recursive=True))
+    assert len(logs) == 20
+    assert sorted(x.value for x in logs)[0] == "log 0"
+    assert all(os.path.exists(x.path) for x in logs)
+
+    names = [os.path.relpath(x.path, runs.path) for x in runs.scan("run-3/*", recursive=True)]
+    assert names == ["run-3/data.csv", "run-3/nested", "run-3/out.log"], names
+
+    # The filename filter applies to the top level
+    filtered = Directory(experiment.runs.path, filename_filter="run-1*")
+    assert len(list(filtered.scan("*.csv", recursive=True))) == 11
+
+    # Iterating still registers the subobjects
+    assert len(list(runs)) == 5021
+    assert len(runs.subobjects) == 5021
+    assert isinstance(runs.subobjects["run-5"], Directory)
+
+    if dirname:
+        shutil.rmtree(dirname)
+    print("success")
@@ -0,0 +1,73 @@
+from __future__ import print_function
+
+import os
+import json
+import shutil
+import tempfile
+
+cache_dir = tempfile.mkdtemp()
+os.environ["XDG_CACHE_HOME"] = cache_dir
+
+from versuchung.experiment import Experiment
+from versuchung.files import Executable, FileFingerprint, checksum_cache, file_checksum
+import hashlib
+
+class FingerprintExperiment(Experiment):
+    inputs = {"binary": Executable("/bin/true"),
+              "data": FileFingerprint("data/a"),
+              "tree": FileFingerprint("data", algorithm="md5")}
+
+    def run(self):
+        assert len(self.data.value) == 64
+        assert len(self.tree.value) == 32
+
+def mkfile(path, content):
+    with open(path, "w") as fd:
+        fd.write(content)
+    # Files modified just now are not cached
+    os.utime(path, (1000000000, 1000000000))
+
+if __name__ == "__main__":
+    os.mkdir("data")
+    os.mkdir("data/sub")
+    mkfile("data/a", "foo")
+    mkfile("data/sub/b", "bar")
+
+    e = FingerprintExperiment()
+    r1 = e([])
+    metadata = e.metadata
+    assert metadata["binary-md5"] == hashlib.md5(open("/bin/true", "rb").read()).hexdigest()
+    assert metadata["data-sha256"] == hashlib.sha256(b"foo").hexdigest()
+    assert "data" not in metadata
+
+    cache_file = os.path.join(cache_dir, "versuchung", "checksums.json")
+    entries = json.load(open(cache_file))
+    key = "sha256:" + os.path.abspath("data/a")
+    assert entries[key][3] == metadata["data-sha256"]
+
+    # A cache hit does not read the file
+    entries[key][3] = "cached"
+    with open(cache_file, "w") as fd:
+        json.dump(entries, fd)
+    checksum_cache.__init__()
+    assert file_checksum("data/a", "sha256") == "cached"
+
+    # Changing the file invalidates the entry
+    mkfile("data/a", "fooo")
+    os.utime("data/a", (1000000001, 1000000001))
+    assert file_checksum("data/a", "sha256") == hashlib.sha256(b"fooo").hexdigest()
+
+    # The directory fingerprint changes with its content
+    e = FingerprintExperiment()
+    r2 = e([])
+    mkfile("data/sub/b", "baz")
+    os.utime("data/sub/b", (1000000002, 1000000002))
+    e = FingerprintExperiment()
+    r3 = e([])
+    assert r2 != r3
+
+    for r in (r1, r2, r3):
+        shutil.rmtree(r)
+    shutil.rmtree("data")
+    shutil.rmtree(cache_dir)
+    print("success")
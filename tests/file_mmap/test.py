@@ -0,0 +1,52 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.files import File
+from versuchung.archives import GzipFile
+
+class ProducerExperiment(Experiment):
+    outputs = {"trace": File("trace"),
+               "empty": File("empty"),
+               "gz": GzipFile("trace.gz")}
+
+    def run(self):
+        self.trace.value = "".join(["line %d\n" % i for i in range(1000)]) + "last"
+        self.empty.value = ""
+
+        # Rewriting the file drops the old mapping
+        self.empty.value = "x" * 10000
+        self.empty.flush()
+        assert len(self.empty.buffer) == 10000
+        self.empty.value = "short\n"
+        self.empty.flush()
+        assert list(self.empty.iter_lines()) == ["short"]
+        self.empty.close()
+        self.empty.value = ""
+        self.gz.value = "a\nb\n"
+
+class ConsumerExperiment(Experiment):
+    inputs = {"data": ProducerExperiment()}
+
+    def run(self):
+        trace = self.data.trace
+        assert trace.buffer[:6].tobytes() == b"line 0"
+        assert len(trace.buffer) == len(trace.value)
+        lines = list(trace.iter_lines())
+        assert len(lines) == 1001
+        assert lines[1] == "line 1" and lines[-1] == "last"
+        assert next(trace.iter_lines(encoding=None)) == b"line 0"
+
+        assert len(self.data.empty.buffer) == 0
+        assert list(self.data.empty.iter_lines()) == []
+
+        # The path of the GzipFile points to the decompressed file
+        assert list(self.data.gz.iter_lines()) == ["a", "b"]
+
+if __name__ == "__main__":
+    import shutil
+    r1 = ProducerExperiment()([])
+    r2 = ConsumerExperiment()(data=r1)
+
+    shutil.rmtree(r1)
+    shutil.rmtree(r2)
+    print("success")
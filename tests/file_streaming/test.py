@@ -0,0 +1,65 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.files import File
+from versuchung.tex import Macros
+import os
+
+class UpperFile(File):
+    def before_write(self, value):
+        return value.upper()
+
+class StreamingExperiment(Experiment):
+    outputs = {"log": File("log", streaming=True),
+               "upper": UpperFile("upper", streaming=True),
+               "buffered": File("buffered"),
+               "reread": File("reread"),
+               "macros": Macros("data.tex", streaming=True)}
+
+    def run(self):
+        for i in range(1000):
+            self.log.write("%d\n" % i, append=True)
+        self.log.flush()
+        with open(self.log.path) as fd:
+            assert len(fd.readlines()) == 1000
+        assert self.log.value.startswith("0\n1\n")
+
+        self.upper.write("foo", append=True)
+        self.upper.write("bar", append=True)
+
+        self.macros.macro("Foo", 23)
+        self.macros.flush()
+        with open(self.macros.path) as fd:
+            assert fd.read() == "\\newcommand{\\Foo} {23}\n"
+
+        # Buffered content is kept, streaming is only used in the with block
+        self.buffered.value = "a\n"
+        with self.buffered as f:
+            f.write("b\n", append=True)
+        with open(self.buffered.path) as fd:
+            assert fd.read() == "a\nb\n"
+        self.buffered.write("c\n", append=True)
+
+        # Reading the value while streaming does not cache it
+        self.reread.value = "head\n"
+        with self.reread as f:
+            assert f.value == "head\n"
+            f.write("more\n", append=True)
+            assert f.value == "head\nmore\n"
+
+if __name__ == "__main__":
+    import shutil
+    experiment = StreamingExperiment()
+    dirname = experiment()
+
+    with open(os.path.join(dirname, "upper")) as fd:
+        assert fd.read() == "FOOBAR"
+    with open(os.path.join(dirname, "buffered")) as fd:
+        assert fd.read() == "a\nb\nc\n"
+    with open(os.path.join(dirname, "reread")) as fd:
+        assert fd.read() == "head\nmore\n"
+    with open(os.path.join(dirname, "log")) as fd:
+        assert len(fd.readlines()) == 1000
+
+    shutil.rmtree(dirname)
+    print("success")
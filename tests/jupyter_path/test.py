@@ -0,0 +1,22 @@
+from __future__ import print_function
+
+from versuchung.jupyter import JupyterExperiment
+from versuchung.types import String
+import os
+
+if __name__ == "__main__":
+    import shutil
+    from tempfile import NamedTemporaryFile
+
+    # The notebook runner gets the path of the published result set
+    path = NamedTemporaryFile(mode="r+")
+    e = JupyterExperiment("NotebookExperiment", inputs={"arg0": String("a")})
+    e.begin(globals={"versuchung_path": path.name})
+    assert path.read() == ""
+    e.end()
+    dirname = path.read()
+    assert dirname == e.path
+    assert os.path.isdir(dirname)
+
+    shutil.rmtree(dirname)
+    print("success")
@@ -0,0 +1,36 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.execute import shell, MachineMonitor
+import os
+
+class SimpleExperiment(Experiment):
+    outputs = {"ps": MachineMonitor("monitor", tick_interval=10,
+                                    capture=["cpu", "proc", "cgroup", "percpu"])}
+
+    def run(self):
+        shell("sleep 0.3; python3 -c 'x = \"a\" * 50000000; import time; time.sleep(0.3)'")
+
+if __name__ == "__main__":
+    import shutil, sys
+    try:
+        import psutil
+    except:
+        print("skipped")
+        sys.exit(0)
+
+    experiment = SimpleExperiment()
+    dirname = experiment(sys.argv[1:])
+
+    ps = experiment.ps
+    assert ps.sample_keys[-1] == "cpu_percentage_%d" % (os.cpu_count() - 1)
+    assert all([len(row) == len(ps.sample_keys) for row in ps.value])
+
+    rows = ps.extract(["proc_rss", "proc_count", "cgroup_memory", "disk_read"])
+    assert max([int(x[0]) for x in rows]) > 50000000
+    assert max([int(x[1]) for x in rows]) >= 1
+    # Not captured system wide values
+    assert set([x[3] for x in rows]) == set(["-1"])
+
+    shutil.rmtree(dirname)
+    print("success")
@@ -0,0 +1,58 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.execute import shell, MachineMonitor
+import os
+import gzip
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class SimpleExperiment(Experiment):
+    outputs = {"ps": MachineMonitor("monitor", tick_interval=10, flush_interval=50),
+               "ring": MachineMonitor("ring.gz", tick_interval=10,
+                                      compressed=True, keep_samples=5)}
+
+    def run(self):
+        shell("sleep 0.5")
+        # Samples are already on disk, while the experiment is running
+        with open(self.ps.path) as fd:
+            assert len(fd.readlines()) > 5
+        assert len(self.ring.value) == 5
+        assert len(self.ps.extract(["time"])) > 5
+        if numpy:
+            assert self.ring.extract_array(["time"]).shape == (5, 1)
+
+class InputExperiment(Experiment):
+    inputs = {"se": SimpleExperiment()}
+
+    def run(self):
+        assert len(self.se.ps.value) > 5 and len(self.se.ring.value) > 5
+        times = [float(x[0]) for x in self.se.ring.extract(["time"])]
+        assert times == sorted(times)
+        if numpy:
+            # The compressed samples are read from disk
+            a = self.se.ring.extract_array(["time", "cpu_percentage"])
+            assert a.shape == (len(times), 2)
+            assert list(a[:, 0]) == times
+            assert self.se.ring.resample(["cpu_percentage"], window=100).shape[1] == 2
+
+if __name__ == "__main__":
+    import shutil, sys
+    try:
+        import psutil
+    except:
+        print("skipped")
+        sys.exit(0)
+
+    experiment = SimpleExperiment()
+    dirname = experiment(sys.argv[1:])
+    with gzip.open(os.path.join(dirname, "ring.gz"), "rt") as fd:
+        assert len(fd.readlines()) > 5
+
+    dirname2 = InputExperiment()(se=dirname)
+
+    shutil.rmtree(dirname)
+    shutil.rmtree(dirname2)
+    print("success")
@@ -0,0 +1,73 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.files import Directory
+import os
+
+source = os.path.abspath("source")
+
+class MirrorExperiment(Experiment):
+    outputs = {"copied": Directory("copied"),
+               "hardlink": Directory("hardlink"),
+               "reflink": Directory("reflink"),
+               "parallel": Directory("parallel"),
+               "filtered": Directory("filtered")}
+
+    def run(self):
+        src = source
+        self.copied.mirror_directory(src)
+        self.hardlink.mirror_directory(src, strategy="hardlink")
+        self.reflink.mirror_directory(src, strategy="reflink")
+        self.parallel.mirror_directory(src, jobs=4, incremental=True)
+        self.filtered.mirror_directory(src, lambda x: not x.endswith(".skip"),
+                                       strategy="hardlink", jobs=2)
+
+        for d in ("copied", "hardlink", "reflink", "parallel", "filtered"):
+            p = getattr(self, d).path
+            assert open(os.path.join(p, "sub/7")).read() == "7" * 7, d
+            assert len(os.listdir(os.path.join(p, "sub"))) == 20, d
+
+        p = self.hardlink.path
+        assert os.path.samefile(os.path.join(p, "sub/3"), os.path.join(src, "sub/3"))
+        assert not os.path.samefile(os.path.join(self.copied.path, "sub/3"), os.path.join(src, "sub/3"))
+        assert os.path.exists(os.path.join(p, "x.skip"))
+        assert not os.path.exists(os.path.join(self.filtered.path, "x.skip"))
+
+        # Incremental: only changed files are mirrored again. Unchanged
+        # files keep their inode, overwritten files get a new one.
+        p = self.parallel.path
+        ino = os.stat(os.path.join(p, "sub/1")).st_ino
+        with open(os.path.join(src, "sub/2"), "w") as fd:
+            fd.write("changed")
+        self.parallel.mirror_directory(src, jobs=4, incremental=True)
+        assert os.stat(os.path.join(p, "sub/1")).st_ino == ino
+        assert open(os.path.join(p, "sub/2")).read() == "changed"
+
+        # Copying over a hardlink does not modify the source
+        self.hardlink.mirror_directory(src)
+        with open(os.path.join(self.hardlink.path, "sub/4"), "w") as fd:
+            fd.write("modified")
+        assert open(os.path.join(src, "sub/4")).read() == "4444"
+
+        try:
+            self.copied.mirror_directory(src, strategy="symlink")
+            assert False
+        except RuntimeError:
+            pass
+
+if __name__ == "__main__":
+    import shutil
+    os.makedirs("source/sub")
+    for i in range(20):
+        with open("source/sub/%d" % i, "w") as fd:
+            fd.write(str(i) * i)
+    with open("source/x.skip", "w") as fd:
+        fd.write("x")
+
+    experiment = MirrorExperiment()
+    dirname = experiment([])
+
+    shutil.rmtree("source")
+    if dirname:
+        shutil.rmtree(dirname)
+    print("success")
@@ -0,0 +1,49 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.types import String
+from versuchung.files import File
+import os
+import json
+
+class SimpleExperiment(Experiment):
+    inputs = {"input_key": String("default key")}
+    outputs = {"output_file": File("output")}
+
+    runs = 0
+
+    def run(self):
+        SimpleExperiment.runs += 1
+        self.outputs.output_file.value = self.inputs.input_key.value + "\n"
+
+if __name__ == "__main__":
+    import shutil
+    e1 = SimpleExperiment()
+    r1 = e1(input_key="foo")
+    assert SimpleExperiment.runs == 1 and not e1.reused
+
+    # A finished result set is reused
+    e2 = SimpleExperiment()
+    r2 = e2(input_key="foo", reuse=True)
+    assert r1 == r2
+    assert SimpleExperiment.runs == 1 and e2.reused
+    assert e2.output_file.value == "foo\n"
+    assert "date-end" in e2.metadata
+
+    # Without reuse, the result set is recalculated
+    r3 = SimpleExperiment()(["--input_key", "foo"])
+    assert r1 == r3 and SimpleExperiment.runs == 2
+
+    # Incomplete result sets are calculated again
+    with open(os.path.join(r1, "metadata")) as fd:
+        metadata = json.load(fd)
+    del metadata["date-end"]
+    with open(os.path.join(r1, "metadata"), "w") as fd:
+        json.dump(metadata, fd)
+
+    r4 = SimpleExperiment()(["--input_key", "foo", "--reuse"])
+    assert r1 == r4 and SimpleExperiment.runs == 3
+
+    if r1:
+        shutil.rmtree(r1)
+    print("success")
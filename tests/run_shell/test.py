@@ -31,6 +31,10 @@ if __name__ == "__main__":
     import shutil
     experiment = ShellExperiment()
     dirname = experiment()
+    # The tracker follows the published result set
+    assert shell.track.base_directory == experiment.path
+    assert os.path.exists(os.path.join(experiment.path, "shell_0_stdout"))
+    shell.track.disable()
     print("success")
     if dirname:
         shutil.rmtree(dirname)
@@ -0,0 +1,69 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment, ExperimentError
+from versuchung.scheduler import Job, schedule
+from versuchung.search import search_experiment_results
+from versuchung.types import String, List
+from versuchung.files import File
+import os
+
+class Producer(Experiment):
+    inputs = {"input_key": String("default key")}
+    outputs = {"output_file": File("output")}
+
+    def run(self):
+        if self.input_key.value == "fail":
+            raise RuntimeError("expected failure")
+        self.output_file.value = self.input_key.value
+
+class Consumer(Experiment):
+    inputs = {"a": Producer(), "b": Producer()}
+    outputs = {"output_file": File("output")}
+
+    def run(self):
+        self.output_file.value = self.a.output_file.value + self.b.output_file.value
+
+class DefaultConsumer(Experiment):
+    inputs = {"consumer": Consumer(),
+              "producer": Producer(),
+              "all": lambda self: List(Producer(), search_experiment_results(Producer, "."))}
+    outputs = {"output_file": File("output")}
+
+    def run(self):
+        self.output_file.value = "%s %s %d" % (self.consumer.output_file.value,
+                                              self.producer.output_file.value,
+                                              len(self.all))
+
+if __name__ == "__main__":
+    import shutil
+    x = Job(Producer, input_key="x")
+    y = Job(Producer, input_key="y")
+    consumer = Job(Consumer, a=x, b=y)
+    r = schedule(consumer, jobs=2)
+    assert consumer.identifier == r
+    with open(os.path.join(r, "output")) as fd:
+        assert fd.read() == "xy"
+
+    # Producers are reused
+    with open(os.path.join(x.path, "metadata")) as fd:
+        metadata = fd.read()
+    assert schedule(Consumer, jobs=2, a=Job(Producer, input_key="x"), b=y) == r
+    with open(os.path.join(x.path, "metadata")) as fd:
+        assert metadata == fd.read()
+
+    # Experiment inputs without result sets are produced with default values
+    r2 = schedule(DefaultConsumer, jobs=4, consumer=consumer)
+    with open(os.path.join(r2, "output")) as fd:
+        assert fd.read() == "xy default key 3"
+
+    # Consumers of failed producers are skipped
+    try:
+        schedule(Consumer, a=Job(Producer, input_key="fail"), b=y)
+        assert False
+    except ExperimentError:
+        pass
+
+    for d in os.listdir("."):
+        if d.lstrip(".").split("-")[0] in ("Producer", "Consumer", "DefaultConsumer"):
+            shutil.rmtree(d)
+    print("success")
@@ -0,0 +1,44 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.execute import shell, shell_parallel, CommandFailed, CommandsFailed
+
+import os
+import time
+
+class ParallelExperiment(Experiment):
+    def run(self):
+        start = time.time()
+        results = shell_parallel([("sleep 0.5; echo %s", str(x)) for x in range(8)], jobs=8)
+        assert time.time() - start < 3
+        assert results == [([str(x)], 0) for x in range(8)]
+
+        assert shell_parallel(["echo a", "echo b"], jobs=1) == [(["a"], 0), (["b"], 0)]
+
+        try:
+            shell_parallel(["echo 1", "echo 2; exit 3", "/bin/false"])
+            assert False
+        except CommandFailed as e:
+            assert type(e) == CommandsFailed
+            assert len(e.failed) == 2
+            assert e.results == [(["1"], 0), (["2"], 3), ([""], 1)]
+
+        # Every tracked command gets its own files
+        shell.track(self.path)
+        shell_parallel([("echo %s", str(x)) for x in range(20)], jobs=4)
+        shell.track.disable()
+        outputs = set()
+        for x in range(20):
+            with open(os.path.join(self.path, "shell_%d_stdout" % x)) as fd:
+                outputs.add(fd.read())
+        assert outputs == set(["%d\n" % x for x in range(20)])
+        with open(os.path.join(self.path, "shell_rusage.jsonl")) as fd:
+            assert len(fd.readlines()) == 20
+
+if __name__ == "__main__":
+    import shutil
+    experiment = ParallelExperiment()
+    dirname = experiment()
+    if dirname:
+        shutil.rmtree(dirname)
+    print("success")
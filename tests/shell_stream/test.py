@@ -0,0 +1,41 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment
+from versuchung.execute import shell, shell_iter, CommandFailed
+
+import os
+
+class StreamExperiment(Experiment):
+    def run(self):
+        lines = []
+        assert ([], 0) == shell("seq 1 3", stream=lines.append)
+        assert lines == ["1", "2", "3"]
+
+        with open(os.path.join(self.path, "log"), "w") as fd:
+            shell("echo %s; echo", "foo bar", stream=fd)
+        with open(os.path.join(self.path, "log")) as fd:
+            assert fd.read() == "foo bar\n\n"
+
+        assert list(shell_iter("seq 1 %s", "3")) == ["1", "2", "3"]
+
+        # Stop reading early, the process is killed
+        for line in shell_iter("yes"):
+            break
+
+        try:
+            list(shell_iter("echo 1; /bin/false"))
+            assert False
+        except CommandFailed:
+            pass
+
+        # Return value is unchanged without streaming
+        assert shell("true") == ([""], 0)
+        assert shell("printf 'a\\n\\nb'") == (["a", "", "b"], 0)
+
+if __name__ == "__main__":
+    import shutil
+    experiment = StreamExperiment()
+    dirname = experiment()
+    if dirname:
+        shutil.rmtree(dirname)
+    print("success")
@@ -0,0 +1,46 @@
+from __future__ import print_function
+
+from versuchung.experiment import Experiment, sweep_points
+from versuchung.types import String
+from versuchung.files import File
+import os
+
+class SimpleExperiment(Experiment):
+    inputs = {"input_key": String("default key"),
+              "input_value": String("default value")}
+    outputs = {"output_file": File("output")}
+
+    def run(self):
+        if self.inputs.input_value.value == "fail":
+            raise RuntimeError("expected failure")
+        self.outputs.output_file.value = "%s: %s\n" % (self.inputs.input_key.value,
+                                                       os.getpid())
+
+if __name__ == "__main__":
+    import shutil
+    assert sweep_points({"a": ["1", "2"], "b": "x"}) == \
+        [{"a": "1", "b": "x"}, {"a": "2", "b": "x"}]
+    assert sweep_points([{"a": "1"}]) == [{"a": "1"}]
+
+    experiment = SimpleExperiment()
+    results = experiment.sweep({"input_key": ["a", "b", "c"],
+                                "input_value": ["x", "fail"]},
+                               jobs=2)
+    assert len(results) == 6
+    assert results[1] is None and results[3] is None and results[5] is None
+    ok = [r for r in results if r]
+    assert len(set(ok)) == 3
+    pids = set()
+    for r in ok:
+        with open(os.path.join(r, "output")) as fd:
+            pids.add(fd.read().split(": ")[1])
+    assert str(os.getpid()) + "\n" not in pids
+
+    # Reusing the finished points
+    assert experiment.sweep([{"input_key": "a", "input_value": "x"}],
+                            reuse=True) == [results[0]]
+
+    for d in os.listdir("."):
+        if d.startswith("SimpleExperiment-") or d.startswith(".SimpleExperiment-"):
+            shutil.rmtree(d)
+    print("success")
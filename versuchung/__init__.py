@@ -1,3 +1,3 @@
-__all__ = ["archives", "experiment", "files", "tex", "types", "tools", "events", "search", 'database']
+__all__ = ["archives", "experiment", "files", "tex", "types", "tools", "events", "search", 'database', 'scheduler']
 
 from . import *
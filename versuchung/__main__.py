@@ -132,7 +132,7 @@ def main(argv):
         # Copy Output Jupyter Notebook to directory
         experiment_dir = path.read()
         if not experiment_dir:
-            raise RuntimeError("Notebook does not experiment path. Did you call experiment.begin()")
+            raise RuntimeError("Notebook does not experiment path. Did you call experiment.begin() and experiment.end()")
         dst = os.path.join(experiment_dir, os.path.basename(argv[0]))
         with open(dst, "wb+") as ipynb:
             ipynb.write(output.read())
@@ -21,7 +21,9 @@ import logging
 import os
 import sys
 import gzip
+import io
 import re
+import shutil
 from subprocess import PIPE
 try:
     from StringIO import StringIO as BytesIO
@@ -388,34 +390,141 @@ class GitArchive(InputParameter, Type, Directory_op_with):
         return self.value.path
 
 
-class GzipFile(File):
-    def __init__(self, default_filename=""):
-        File.__init__(self, default_filename, binary=True)
+class CompressedFile(File):
+    """Can be used as: **input parameter** and **output parameter**
+
+    Base class for files that are stored compressed. The
+    :attr:`~versuchung.files.File.value` is the decompressed content,
+    the file on disk (:attr:`original_path`) is compressed with the
+    given compression ``level``. With ``streaming=True``, all
+    :meth:`~versuchung.files.File.write` calls go through a single
+    compressor stream, so large outputs are never held in memory. The
+    :attr:`value` of such a file can only be read after the stream was
+    closed (see :meth:`~versuchung.files.File.close`).
+
+    All compression and decompression is done in-process.
+    :meth:`iter_lines` decompresses large inputs on the fly::
+
+        for line in self.i.trace.iter_lines():
+            ...
+
+    """
+
+    extension = None
+
+    def __init__(self, default_filename="", level=None, streaming=False):
+        File.__init__(self, default_filename, binary=True, streaming=streaming)
+        self.level = level
+        self.__stream = None
+
+    @property
+    def value(self):
+        """The decompressed content of the file"""
+        if self.__stream is not None and not self.__stream.closed:
+            # The compressed stream is incomplete until it is closed
+            raise RuntimeError("Cannot read the value of a compressed file while it is streamed")
+        return File.value.fget(self)
+
+    @value.setter
+    def value(self, value):
+        File.value.fset(self, value)
+
+    def open_compressed(self, fileobj, mode):
+        """Open a file object (or file name) for binary (de)compression"""
+        raise NotImplementedError
 
     @property
     def path(self):
         """Decompress file into the temporary directory and return path to this location"""
         assert self.tmp_directory is not None, \
-            "Can gunzip file only as part of an active experiment"
+            "Can decompress file only as part of an active experiment"
 
         path = File.path.fget(self)
-        base = os.path.basename(path.rstrip(".gz"))
+        base = os.path.basename(path)
+        if base.endswith(self.extension):
+            base = base[:-len(self.extension)]
         filename = os.path.join(self.tmp_directory.path,
                                 self.name + "_" + base)
 
         if not os.path.exists(filename):
-            shell("gunzip < %s > %s", path, filename)
+            with self.open_compressed(path, "rb") as src, \
+                 open(filename, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
 
         return filename
 
+    def iter_lines(self, encoding="utf-8"):
+        """Iterate over the decompressed lines of the file without the
+        trailing newline. The file is decompressed while reading and
+        is never written to disk."""
+        with self.open_compressed(self.original_path, "rb") as fd:
+            for line in fd:
+                line = line.rstrip(b"\n")
+                yield line.decode(encoding) if encoding else line
+
+    def open_stream(self, mode):
+        self.__stream = self.open_compressed(self.original_path, mode + "b")
+        return self.__stream
+
+    def before_stream_write(self, value):
+        return value.encode()
+
     def after_read(self, value):
-        x = BytesIO(value)
-        fd = gzip.GzipFile(fileobj=x)
-        return fd.read().decode()
+        with self.open_compressed(BytesIO(value), "rb") as fd:
+            return fd.read().decode()
 
     def before_write(self, value):
         x = BytesIO()
-        fd = gzip.GzipFile(fileobj=x, mode="w")
-        fd.write(value.encode())
-        fd.close()
+        with self.open_compressed(x, "wb") as fd:
+            fd.write(value.encode())
         return x.getvalue()
+
+
+class GzipFile(CompressedFile):
+    """A :class:`CompressedFile` compressed with :mod:`gzip`
+    (default level: 9)."""
+
+    extension = ".gz"
+
+    def open_compressed(self, fileobj, mode):
+        if "r" in mode:
+            return gzip.open(fileobj, mode)
+        return gzip.open(fileobj, mode, compresslevel=9 if self.level is None else self.level)
+
+
+class ZstdFile(CompressedFile):
+    """A :class:`CompressedFile` compressed with zstd (default level:
+    3). Requires the zstandard package."""
+
+    extension = ".zst"
+
+    def open_compressed(self, fileobj, mode):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Please install zstandard to use ZstdFile")
+        if "r" in mode:
+            # The zstandard reader does not support readline()
+            return io.BufferedReader(zstandard.open(fileobj, mode))
+        cctx = zstandard.ZstdCompressor(level=3 if self.level is None else self.level)
+        return zstandard.open(fileobj, mode, cctx=cctx)
+
+
+class Lz4File(CompressedFile):
+    """A :class:`CompressedFile` compressed with the LZ4 frame format
+    (default level: 0, the fastest one). Requires the lz4 package."""
+
+    extension = ".lz4"
+
+    def open_compressed(self, fileobj, mode):
+        try:
+            import lz4.frame
+        except ImportError:
+            raise RuntimeError("Please install lz4 to use Lz4File")
+        if "r" in mode:
+            return lz4.frame.open(fileobj, mode)
+        return lz4.frame.open(fileobj, mode, compression_level=0 if self.level is None else self.level)
+
+
+compressed_file_types = {"gzip": GzipFile, "zstd": ZstdFile, "lz4": Lz4File}
+"""The :class:`CompressedFile` types by the name of their compression"""
@@ -18,6 +18,12 @@ from versuchung.types import Type, InputParameter, OutputParameter
 import logging
 import sqlite3
 import os, stat
+import sys
+import shutil
+import hashlib
+import re
+import threading
+import time
 
 # Import mysql handler
 try:
@@ -155,6 +161,28 @@ database=%s
         self.__database_connection.commit()
         return c
 
+    def executemany(self, command, rows):
+        """Execute the command once for every tuple of arguments in
+        ``rows``. All statements are committed together."""
+        logging.debug("mysql: %s (many)", str(command))
+        c = self.__database_connection.cursor()
+        c.executemany(command.replace("?", "%s"), rows)
+        self.__database_connection.commit()
+        return c
+
+    def commit(self):
+        """Commit the current transaction"""
+        self.__database_connection.commit()
+
+    def create_index(self, table, columns):
+        """Create an index over the ``columns`` of a table. An already
+        existing index is kept."""
+        name = table + "__" + "_".join(columns)
+        try:
+            return self.execute("CREATE INDEX %s ON %s (%s)" % (name, table, ", ".join(columns)))
+        except _mysql_exceptions.OperationalError as e:
+            logging.warning("mysql: could not create index %s: %s", name, e)
+
     def create_table(self, name, fields = [("key", "text"), ("value", "text")],
                      keys = None, conflict_strategy = None):
         """Creates a new table in the database. ``name`` is the name
@@ -180,19 +208,63 @@ database=%s
 class Database_SQLite(InputParameter, OutputParameter, Type, Database_Abstract):
     """Can be used as **input parameter** and **output parameter**
 
-    A database backend class for sqlite3 database."""
+    A database backend class for sqlite3 database.
+
+    The ``pragmas`` are applied to the connection when the database is
+    opened. Either give a dict from pragma to value or
+    ``"performance"`` for the :attr:`performance_pragmas`, which use a
+    write-ahead log, fewer syncs and larger caches::
+
+    >>> Database_SQLite("results.db", pragmas="performance")
+
+    A database that was written in WAL mode is switched back to a
+    rollback journal when it is closed, so the result set contains a
+    single self-contained database file.
+
+    Several experiments, also when running in parallel processes, can
+    write into one database outside of their result sets with
+    ``shared=True``::
+
+    >>> Database_SQLite("/data/all-results.db", shared=True)
+
+    As output, every experiment then writes into its own shard
+    database in its temporary directory. When the experiment has
+    finished, the shard is merged into the shared database within a
+    single transaction. The rows that a previous run of the same
+    experiment has left in the shared database are replaced. If the
+    shared database is locked by another writer, SQLite waits up to
+    ``timeout`` seconds, and the merge is retried up to ``retries``
+    times with an increasing delay. The shared database does not
+    become read-only.
+    """
 
     # Static cache of all database connections open in system
     # Map from path -> tuple(db_handle, use_count)
     database_connections = {}
+    database_connections_lock = threading.Lock()
 
-    def __init__(self, path = "sqlite3.db"):
+    performance_pragmas = {"journal_mode": "WAL",
+                           "synchronous": "NORMAL",
+                           "mmap_size": 1 << 30,
+                           "cache_size": -64 * 1024,
+                           "temp_store": "MEMORY"}
+    """The pragmas of the ``"performance"`` profile"""
+
+    def __init__(self, path = "sqlite3.db", pragmas = None, shared = False,
+                 timeout = 60.0, retries = 10):
         InputParameter.__init__(self)
         OutputParameter.__init__(self)
         Type.__init__(self)
 
         self.__database_path = path
         self.__database_connection = None
+        self.__connection_path = None
+        if pragmas == "performance":
+            pragmas = self.performance_pragmas
+        self.pragmas = pragmas or {}
+        self.shared = shared
+        self.timeout = timeout
+        self.retries = retries
 
     def inp_setup_cmdline_parser(self, parser):
         self.inp_parser_add(parser, None, self.__database_path)
@@ -210,7 +282,11 @@ class Database_SQLite(InputParameter, OutputParameter, Type, Database_Abstract):
             # Ensure the path does exist
             if not os.path.exists(self.path):
                 raise RuntimeError("Database not found: %s" % self.path)
-        self.__database_connection = self.__connect(self.path)
+        self.__connection_path = self.path
+        if parameter_type == "output" and self.shared:
+            self.__connection_path = self.shard_path
+        self.__database_connection = self.__connect(self.__connection_path,
+                                                    self.pragmas, self.timeout)
 
         if parameter_type == "output":
             try:
@@ -231,38 +307,110 @@ class Database_SQLite(InputParameter, OutputParameter, Type, Database_Abstract):
         Type.before_experiment_run(self, parameter_type)
         assert parameter_type in ["input", "output"]
         self.__database_connection = None
-        self.__disconnect(self.path)
-        if parameter_type == "output":
+        closed = self.__disconnect(self.__connection_path)
+        if parameter_type == "output" and self.shared:
+            # The last user of the shard merges it
+            if closed:
+                self.__merge_shard()
+        elif parameter_type == "output":
             # Remove execute and write permissions for file
             new_mode = os.stat(self.path).st_mode & (stat.S_IROTH | stat.S_IRGRP | stat.S_IRUSR)
             os.chmod(self.path, new_mode)
 
     @staticmethod
-    def __connect(path):
+    def __connect(path, pragmas = {}, timeout = 5.0):
         # Do reference counting on database connections
-        if path in Database_SQLite.database_connections:
-            (db, count) = Database_SQLite.database_connections[path]
-            Database_SQLite.database_connections[path] = (db, count + 1)
-            return db
-        conn = sqlite3.connect(path)
-        Database_SQLite.database_connections[path] = (conn, 1)
-        return conn
+        with Database_SQLite.database_connections_lock:
+            if path in Database_SQLite.database_connections:
+                (db, count) = Database_SQLite.database_connections[path]
+                Database_SQLite.database_connections[path] = (db, count + 1)
+                return db
+            conn = sqlite3.connect(path, timeout = timeout)
+            for (pragma, value) in pragmas.items():
+                try:
+                    conn.execute("PRAGMA %s = %s" % (pragma, value))
+                except sqlite3.OperationalError as e:
+                    # e.g., journal_mode on a read-only database
+                    logging.debug("sqlite: PRAGMA %s failed: %s", pragma, e)
+            Database_SQLite.database_connections[path] = (conn, 1)
+            return conn
 
     @staticmethod
     def __disconnect(path):
-        (db, count) = Database_SQLite.database_connections[path]
-        db.commit()
-        if count == 1:
-            db.close()
-            del Database_SQLite.database_connections[path]
-            return
-        Database_SQLite.database_connections[path] = (db, count - 1)
+        """:return: bool -- True, if the connection was closed"""
+        with Database_SQLite.database_connections_lock:
+            (db, count) = Database_SQLite.database_connections[path]
+            db.commit()
+            if count == 1:
+                if db.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                    db.execute("PRAGMA journal_mode = DELETE")
+                db.close()
+                del Database_SQLite.database_connections[path]
+                return True
+            Database_SQLite.database_connections[path] = (db, count - 1)
+            return False
+
+    def __merge_shard(self):
+        shard = self.shard_path
+        for attempt in range(self.retries + 1):
+            try:
+                conn = sqlite3.connect(self.path, timeout = self.timeout,
+                                       isolation_level = None)
+                try:
+                    self.__merge_into(conn, shard)
+                finally:
+                    conn.close()
+                break
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e) \
+                   or attempt == self.retries:
+                    raise
+                delay = min(0.1 * 2 ** attempt, 10)
+                logging.warning("sqlite: %s is locked, retrying in %.1fs", self.path, delay)
+                time.sleep(delay)
+        os.unlink(shard)
+
+    def __merge_into(self, conn, shard):
+        experiment = self.dynamic_experiment.experiment_identifier
+        conn.execute("ATTACH DATABASE ? AS shard", (shard,))
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Tables before indexes
+                objects = conn.execute("SELECT type, name, sql FROM shard.sqlite_master "
+                                       "WHERE type IN ('table', 'index') AND sql IS NOT NULL "
+                                       "ORDER BY type DESC").fetchall()
+                for (kind, name, sql) in objects:
+                    sql = re.sub("^CREATE (UNIQUE )?(TABLE|INDEX) ",
+                                 "CREATE \\1\\2 IF NOT EXISTS ", sql)
+                    conn.execute(sql)
+                    if kind != "table":
+                        continue
+                    columns = [x[1] for x in conn.execute("PRAGMA shard.table_info(%s)" % name)]
+                    if "experiment" in columns:
+                        conn.execute("DELETE FROM main.%s WHERE experiment = ?" % name,
+                                     (experiment,))
+                    conn.execute("INSERT INTO main.%s (%s) SELECT %s FROM shard.%s" % (
+                        name, ", ".join(columns), ", ".join(columns), name))
+                conn.execute("COMMIT")
+            except:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.execute("DETACH DATABASE shard")
 
     @property
     def path(self):
         """:return: string -- path to the sqlite database file"""
         return os.path.join(self.base_directory, self.__database_path)
 
+    @property
+    def shard_path(self):
+        """:return: string -- path to the shard database of a ``shared`` output database"""
+        digest = hashlib.md5(self.path.encode()).hexdigest()[:8]
+        return os.path.join(self.tmp_directory.path, "shard-%s-%s" % (
+            digest, os.path.basename(self.path)))
+
     @property
     def handle(self):
         """:return: handle -- sqlite3 database handle"""
@@ -278,6 +426,19 @@ class Database_SQLite(InputParameter, OutputParameter, Type, Database_Abstract):
         logging.debug("sqlite: %s %s", str(command), str(args))
         return self.__database_connection.execute(command, args)
 
+    def executemany(self, command, rows):
+        """Execute the command once for every tuple of arguments in
+        ``rows``::
+
+        >>> database.executemany("INSERT INTO t(a, b) values(?, ?)", [(1, 2), (3, 4)])
+        """
+        logging.debug("sqlite: %s (many)", str(command))
+        return self.__database_connection.executemany(command, rows)
+
+    def commit(self):
+        """Commit the current transaction"""
+        self.__database_connection.commit()
+
 
 
     def create_table(self, name, fields = [("key", "text"), ("value", "text")],
@@ -299,6 +460,13 @@ class Database_SQLite(InputParameter, OutputParameter, Type, Database_Abstract):
 
         return self.execute(CT)
 
+    def create_index(self, table, columns):
+        """Create an index over the ``columns`` of a table, if it does
+        not exist yet."""
+        name = table + "__" + "_".join(columns)
+        return self.execute("CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (
+            name, table, ", ".join(columns)))
+
 
 
 def Database( database_type = "sqlite", *args, **kwargs):
@@ -340,8 +508,24 @@ class Table(InputParameter, OutputParameter, Type):
     set is equal (i.e., if you want the same values in the columns given
     as keys to be treated different when coming from different
     experiments), add ``experiment`` to the key set.
+
+    Many rows are inserted fastest with :meth:`insert_many`. With a
+    ``batch_size``, also :meth:`insert` only buffers the rows and
+    writes them in batches of ``batch_size`` rows, each in its own
+    transaction. The buffer is flushed at the end of the experiment
+    or with :meth:`flush`::
+
+    >>> Table([("run", "integer"), ("time", "real")], batch_size=10000)
+
+    Every table has an index on the ``experiment`` column, since all
+    reads select the rows of a single experiment. Further indexes are
+    declared with ``indexes``, either as column name or as tuple of
+    column names::
+
+    >>> Table(["benchmark", ("run", "integer")], indexes=["benchmark", ("benchmark", "run")])
     """
-    def __init__(self, fields, keys = None, db = None, conflict_strategy = "FAIL" ):
+    def __init__(self, fields, keys = None, db = None, conflict_strategy = "FAIL",
+                 batch_size = None, indexes = []):
         self.read_only = True
         InputParameter.__init__(self)
         OutputParameter.__init__(self)
@@ -350,6 +534,10 @@ class Table(InputParameter, OutputParameter, Type):
         self.__keys = keys
         self.__fields = self.__field_typify(["experiment"] + fields)
         self.__conflict_strategy = conflict_strategy
+        self.batch_size = batch_size
+        self.__indexes = [(x,) if type(x) == str else tuple(x) for x in indexes]
+        self.__buffer = []
+        self.__insert_statement = None
 
         if not db:
             self.__db = Database()
@@ -377,6 +565,12 @@ class Table(InputParameter, OutputParameter, Type):
             self.__db.create_table(self.table_name, self.__fields,
                                    keys = self.__keys,
                                    conflict_strategy = self.__conflict_strategy)
+            indexes = list(self.__indexes)
+            # A UNIQUE key starting with experiment is already an index
+            if not self.__keys or self.__keys[0] != "experiment":
+                indexes.insert(0, ("experiment",))
+            for columns in indexes:
+                self.__db.create_index(self.table_name, columns)
     @property
     def database(self):
         """:return: :class:`~versuchung.database.Database` -- the database the table is located in"""
@@ -394,24 +588,74 @@ class Table(InputParameter, OutputParameter, Type):
             pass
         return self.static_experiment.title + "__" + name
 
+    def __statement(self):
+        if self.__insert_statement is None:
+            self.__insert_statement = "INSERT INTO %s(%s) values(%s)" % (
+                self.table_name,
+                ", ".join([f for f, t in self.__fields]),
+                ", ".join(["?" for _ in self.__fields]))
+        return self.__insert_statement
+
+    def __row(self, data):
+        """Convert a dict or a sequence (in the order of the fields)
+        into a row tuple for the insert statement"""
+        experiment = self.dynamic_experiment.experiment_identifier
+        if isinstance(data, dict):
+            data = dict(data)
+            data["experiment"] = experiment
+            assert set(data.keys()) == set([f for f, t in self.__fields])
+            return tuple([data[f] for f, t in self.__fields])
+        row = (experiment,) + tuple(data)
+        assert len(row) == len(self.__fields)
+        return row
+
+    def __write(self, rows):
+        if rows:
+            self.__db.executemany(self.__statement(), rows)
+            self.__db.commit()
+
     def insert(self, data=None, **kwargs):
         """Insert a dict of data into the database table"""
         assert self.read_only == False
         if data:
             kwargs.update(data)
-        kwargs["experiment"] = self.dynamic_experiment.experiment_identifier
-        assert set(kwargs.keys()) == set([f for f, t in self.__fields])
+        row = self.__row(kwargs)
+        if self.batch_size:
+            self.__buffer.append(row)
+            if len(self.__buffer) >= self.batch_size:
+                Table.flush(self)
+        else:
+            self.__db.execute(self.__statement(), *row)
+
+    def insert_many(self, rows):
+        """Insert many rows into the database table. A row is either a
+        dict (like for :meth:`insert`) or a sequence of values in the
+        order of the fields. The rows are inserted with
+        ``executemany`` and committed in chunks of ``batch_size``
+        (default: 10000) rows. ``rows`` can also be a generator."""
+        assert self.read_only == False
+        Table.flush(self)
+        chunk = []
+        for data in rows:
+            chunk.append(self.__row(data))
+            if len(chunk) >= (self.batch_size or 10000):
+                self.__write(chunk)
+                chunk = []
+        self.__write(chunk)
 
-        items = kwargs.items()
-        insert_statement = "INSERT INTO %s(%s) values(%s)" % (
-            self.table_name,
-            ", ".join([f for f, t in items]),
-            ", ".join(["?" for _ in items]))
-        self.__db.execute(insert_statement, *[v for k,v in items])
+    def flush(self):
+        """Write all buffered rows to the database"""
+        (rows, self.__buffer) = (self.__buffer, [])
+        self.__write(rows)
+
+    def after_experiment_run(self, parameter_type):
+        if parameter_type == "output":
+            Table.flush(self)
+        Type.after_experiment_run(self, parameter_type)
 
     def clear(self):
         """Remove all entries associated with the current running experiment"""
-
+        self.__buffer = []
         self.__db.execute("DELETE FROM " + self.table_name +" WHERE experiment = ?",
                           self.dynamic_experiment.experiment_identifier)
 
@@ -423,18 +667,86 @@ class Table(InputParameter, OutputParameter, Type):
         that associates the entry with the experiment is stripped
         apart and only data for the static enclosing experiment is
         shown."""
-        (cols, rows) = self.__db.values(self.table_name, ' where experiment = ?',
-                                        self.static_experiment.experiment_identifier)
-
-        index = cols.index("experiment")
-        table = []
-        for row in rows:
-            l = list(row)
-            del l[index]
-            table.append(tuple(l))
-        del cols[index]
-
-        return tuple(cols), table
+        cols = tuple([f for f, t in self.__fields if f != "experiment"])
+        return cols, list(self.iter_rows())
+
+    def iter_rows(self, columns=None, where=None, args=(), fetch_size=1000):
+        """Iterate over the rows of the static enclosing experiment
+        without loading the whole table. Only the given ``columns``
+        (default: all but the experiment column) are selected. The
+        ``where`` expression further filters the rows, question marks
+        in it are replaced by the ``args``. The rows are fetched from
+        the database in batches of ``fetch_size`` rows::
+
+        >>> for (run, time) in self.i.exp.table.iter_rows(["run", "time"], "time > ?", [1.0]):
+        ...     pass
+        """
+        if not self.read_only:
+            Table.flush(self)
+        names = [f for f, t in self.__fields]
+        if columns is None:
+            columns = names[1:]
+        for column in columns:
+            assert column in names, "Unknown column %s in table %s" % (column, self.table_name)
+
+        query = "SELECT %s FROM %s WHERE experiment = ?" % (", ".join(columns), self.table_name)
+        if where:
+            query += " AND (" + where + ")"
+        cur = self.__db.execute(query, self.static_experiment.experiment_identifier, *args)
+        try:
+            while True:
+                rows = cur.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            cur.close()
+
+    def to_numpy(self, columns=None, where=None, args=()):
+        """Read columns of the table (see :meth:`iter_rows`) as
+        :mod:`numpy` arrays. Integer and real columns become ``int64``
+        and ``float64`` arrays, which are filled directly from the
+        database cursor. Other columns (and numeric columns with NULL
+        values) become generic arrays.
+
+        :rtype: dict -- column name to ``numpy.ndarray``
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("Please install numpy to use Table.to_numpy()")
+
+        types = dict(self.__fields)
+        if columns is None:
+            columns = [f for f, t in self.__fields[1:]]
+        ret = {}
+        for column in columns:
+            values = (row[0] for row in self.iter_rows([column], where, args))
+            sql_type = types.get(column, "").lower()
+            dtype = None
+            if "int" in sql_type:
+                dtype = numpy.int64
+            elif any(x in sql_type for x in ("real", "floa", "doub")):
+                dtype = numpy.float64
+            if dtype is not None:
+                try:
+                    ret[column] = numpy.fromiter(values, dtype)
+                    continue
+                except (TypeError, ValueError):
+                    values = (row[0] for row in self.iter_rows([column], where, args))
+            ret[column] = numpy.asarray(list(values))
+        return ret
+
+    def to_dataframe(self, columns=None, where=None, args=()):
+        """Like :meth:`to_numpy`, but returns a ``pandas.DataFrame``"""
+        try:
+            import pandas
+        except ImportError:
+            raise RuntimeError("Please install pandas to use Table.to_dataframe()")
+        if columns is None:
+            columns = [f for f, t in self.__fields[1:]]
+        return pandas.DataFrame(self.to_numpy(columns, where, args), columns=columns)
 
 
 class TableDict(Table, dict):
@@ -461,10 +773,7 @@ class TableDict(Table, dict):
     def flush(self):
         """Save the current dict content to the database."""
         Table.clear(self)
-        for key, value in self.items():
-            Table.insert(self,
-                         {self.__key_name: key,
-                          self.__value_name: value})
+        Table.insert_many(self, self.items())
 
     def after_experiment_run(self, parameter_type):
         assert self.parameter_type == parameter_type
@@ -475,50 +784,93 @@ class TableDict(Table, dict):
     def before_experiment_run(self, parameter_type):
         Table.before_experiment_run(self, parameter_type)
         if parameter_type == "input":
-            (header, values) = self.value
-            key_index = header.index(self.__key_name)
-            value_index = header.index(self.__value_name)
-            self.update([(x[key_index], x[value_index]) for x in values])
+            self.update(self.iter_rows([self.__key_name, self.__value_name]))
 
 
 
+def _premerge(args):
+    """Worker of the parallel pre-merge in :class:`Database_SQlite_Merger`"""
+    (target_path, source_paths, attach_batch) = args
+    merger = Database_SQlite_Merger(target_path, source_paths, logging = False,
+                                    attach_batch = attach_batch)
+    merger.merge(update = False)
+    return target_path
+
 class Database_SQlite_Merger:
+    """Merges many versuchung sqlite databases into a single target
+    database. The rows are copied within SQLite with ``INSERT
+    ... SELECT``. The source databases are attached in batches of
+    ``attach_batch`` databases, so any number of sources can be
+    merged. In tables with UNIQUE keys, duplicates are handled by
+    their conflict strategies; into all other tables, every distinct
+    row is inserted only once, regardless in how many sources it
+    occurs or whether it is already in the target.
+
+    With ``jobs`` > 1, the sources are split into ``jobs`` parts,
+    which are merged into temporary databases by parallel processes
+    before they are merged into the target. The ``progress`` function
+    is called with the number of merged and of all sources after
+    every batch::
+
+        merger = Database_SQlite_Merger("all.db", sources, jobs=4,
+                                        progress=lambda done, total: print(done, total))
+        merger.merge()
+    """
+
     def log(self, msg, *args):
         if self.logging:
             print("merger: " + (msg % args))
 
-    def __init__(self, target_path, source_paths = [], logging = True):
+    def __init__(self, target_path, source_paths = [], logging = True,
+                 attach_batch = 8, jobs = 1, progress = None):
         self.target_path = target_path
         self.logging = logging
-        self.source_paths = {}
+        self.attach_batch = attach_batch
+        self.jobs = jobs
+        self.progress = progress
+        self.source_paths = []
         self.target = sqlite3.connect(target_path)
 
-        db_counter = 0
         for source in source_paths:
             assert os.path.exists(source), "Path does not exist " + source
-            name = "db_%d" % db_counter
-            db_counter += 1
-            self.target.execute("ATTACH DATABASE '%s' AS %s" %(source, name))
-            self.log("attached %s as %s", source, name)
-            self.source_paths[name] = source
+            self.source_paths.append(source)
+
+    def __batches(self, sources):
+        for i in range(0, len(sources), self.attach_batch):
+            yield sources[i:i + self.attach_batch]
+
+    def __attach(self, sources):
+        names = []
+        for (i, source) in enumerate(sources):
+            name = "db_%d" % i
+            self.target.execute("ATTACH DATABASE ? AS %s" % name, (source,))
+            names.append(name)
+        return names
+
+    def __detach(self, names):
+        for name in names:
+            self.target.execute("DETACH DATABASE %s" % name)
 
     def collect_and_create_tables(self, drop = True):
         cur = self.target.cursor()
         self.tables = {}
-        for db in self.source_paths:
-            cur.execute("SELECT * FROM " + db + ".sqlite_master WHERE type = 'table'")
-            header = [x[0] for x in cur.description]
-            for table in cur.fetchall():
-                table = dict(zip(header, table))
-                name = table["name"]
-                if table["name"] in self.tables:
-                    if self.tables[name]["sql"] != table["sql"]:
-                        self.log("Two tables with different defintions found: %s" % name)
-                        sys.exit(-1)
-                    self.tables[name]["databases"].append(db)
-                else:
-                    self.tables[name] = table
-                    self.tables[name]["databases"] = [db]
+        for sources in self.__batches(self.source_paths):
+            names = self.__attach(sources)
+            for (db, source) in zip(names, sources):
+                cur.execute("SELECT * FROM " + db + ".sqlite_master WHERE type = 'table'")
+                header = [x[0] for x in cur.description]
+                for table in cur.fetchall():
+                    table = dict(zip(header, table))
+                    name = table["name"]
+                    if table["name"] in self.tables:
+                        if self.tables[name]["sql"] != table["sql"]:
+                            self.log("Two tables with different defintions found: %s" % name)
+                            sys.exit(-1)
+                        self.tables[name]["databases"].append(source)
+                    else:
+                        self.tables[name] = table
+                        self.tables[name]["databases"] = [source]
+            self.__detach(names)
         for name, table in self.tables.items():
             if drop:
                 try:
@@ -535,50 +887,110 @@ class Database_SQlite_Merger:
 
     def collect_data(self):
         cur = self.target.cursor()
+        cur.execute("CREATE TABLE IF NOT EXISTS TableDict (experiment text, key text, value text,"
+                    "UNIQUE (key) ON CONFLICT REPLACE)")
 
-        TableDictrows = set()
-
+        headers, keyed = {}, {}
         for name in self.tables:
-            rows = set()
-            headers = None
-            for db in self.tables[name]["databases"]:
-                cur.execute("SELECT * FROM %s.%s" % (db, name))
-                for i in cur.fetchall():
-                    rows.add(i)
-                headers = [x[0] for x in cur.description]
-
-            cur.executemany("INSERT INTO %s (%s) values(%s)" % (\
-                    name,
-                    ", ".join(headers),
-                    ", ".join(["?" for x in headers])
-                    ), rows)
-            self.log("inserted %d rows into %s", len(rows), name)
-
+            cur.execute("PRAGMA main.table_info(%s)" % name)
+            headers[name] = [x[1] for x in cur.fetchall()]
+            cur.execute("PRAGMA main.index_list(%s)" % name)
+            keyed[name] = any([x[2] for x in cur.fetchall()])
+            if not keyed[name]:
+                # Rows are looked up in this index before they are
+                # inserted. A UNIQUE index would not treat NULLs as equal.
+                cur.execute("CREATE INDEX IF NOT EXISTS main.merge_dedup_%s ON %s (%s)" % (
+                    name, name, ", ".join(headers[name])))
+        counts = dict([(name, 0) for name in self.tables])
+
+        done = 0
+        for sources in self.__batches(self.source_paths):
+            names = self.__attach(sources)
+            for name in self.tables:
+                dbs = [db for (db, source) in zip(names, sources)
+                       if source in self.tables[name]["databases"]]
+                if not dbs:
+                    continue
+                columns = ", ".join(headers[name])
+                if keyed[name]:
+                    # The conflict strategy decides, later sources win
+                    for db in dbs:
+                        cur.execute("INSERT INTO main.%s (%s) SELECT DISTINCT %s FROM %s.%s" % (
+                            name, columns, columns, db, name))
+                        counts[name] += cur.rowcount
+                else:
+                    selects = ["SELECT %s FROM %s.%s" % (columns, db, name) for db in dbs]
+                    exists = " AND ".join(["t.%s IS s.%s" % (c, c) for c in headers[name]])
+                    cur.execute("INSERT INTO main.%s (%s) SELECT DISTINCT %s FROM (%s) AS s "
+                                "WHERE NOT EXISTS (SELECT 1 FROM main.%s AS t WHERE %s)" % (
+                                    name, columns, columns, " UNION ".join(selects), name, exists))
+                    counts[name] += cur.rowcount
+                if headers[name] == ["experiment", "key", "value"]:
+                    for db in dbs:
+                        cur.execute("INSERT INTO main.TableDict (experiment, key, value) "
+                                    "SELECT experiment, key, value FROM %s.%s" % (db, name))
+                        counts.setdefault("TableDict", 0)
+                        counts["TableDict"] += cur.rowcount
+            self.target.commit()
+            self.__detach(names)
+            done += len(sources)
+            self.log("merged %d/%d databases", done, len(self.source_paths))
+            if self.progress:
+                self.progress(done, len(self.source_paths))
 
-            if headers == ["experiment", "key", "value"]:
-                TableDictrows.update(rows)
+        for name in self.tables:
+            if not keyed[name]:
+                cur.execute("DROP INDEX IF EXISTS main.merge_dedup_%s" % name)
+        self.target.commit()
 
-        cur.execute("CREATE TABLE IF NOT EXISTS TableDict (experiment text, key text, value text,"
-                    "UNIQUE (key) ON CONFLICT REPLACE)")
-        cur.executemany("INSERT INTO TableDict (experiment, key, value) values(?,?,?)",
-                        TableDictrows)
-        self.log("inserted %d key-value pairs into TableDict", len(TableDictrows))
+        for name in sorted(counts):
+            self.log("inserted %d rows into %s", counts[name], name)
         cur.close()
-        self.target.commit()
+
+    def __premerge(self):
+        """Merge parts of the sources in parallel into temporary
+        databases, which become the new sources"""
+        import multiprocessing
+        import tempfile
+        tmpdir = tempfile.mkdtemp(prefix = "merge-",
+                                  dir = os.path.dirname(os.path.abspath(self.target_path)))
+        size = (len(self.source_paths) + self.jobs - 1) // self.jobs
+        parts = [(os.path.join(tmpdir, "part-%d.db" % i),
+                  self.source_paths[i * size:(i + 1) * size],
+                  self.attach_batch)
+                 for i in range(self.jobs) if self.source_paths[i * size:(i + 1) * size]]
+        self.log("pre-merging %d databases in %d parts", len(self.source_paths), len(parts))
+        pool = multiprocessing.get_context("fork").Pool(len(parts))
+        try:
+            self.source_paths = pool.map(_premerge, parts)
+        finally:
+            pool.close()
+            pool.join()
+        return tmpdir
 
     def merge(self, update = True):
         """Do the actual merge operation"""
-        self.collect_and_create_tables(drop = not update)
-        self.collect_data()
-        self.target.close()
+        tmpdir = None
+        if self.jobs > 1 and len(self.source_paths) > self.jobs:
+            tmpdir = self.__premerge()
+        try:
+            self.collect_and_create_tables(drop = not update)
+            self.collect_data()
+        finally:
+            self.target.close()
+            if tmpdir:
+                shutil.rmtree(tmpdir)
 
 
 if __name__ == '__main__':
-    import sys
-    if len(sys.argv) < 2:
-        print(sys.argv[0] + " <target-database-file> [<source-db1> <source-db2> ...]")
+    args = sys.argv[1:]
+    jobs = 1
+    if args and args[0].startswith("-j"):
+        jobs = int(args.pop(0)[2:])
+    if len(args) < 1:
+        print(sys.argv[0] + " [-j<jobs>] <target-database-file> [<source-db1> <source-db2> ...]")
         print(" -- merges different versuchung sqlite databases into a single one")
         sys.exit(-1)
 
-    merger = Database_SQlite_Merger(sys.argv[1], sys.argv[2:])
+    merger = Database_SQlite_Merger(args[0], args[1:], jobs = jobs)
     merger.merge()
@@ -17,12 +17,17 @@ from versuchung.files import CSV_File
 import logging
 import os
 import resource
-try:
-    import thread
-except ImportError:
-    import _thread as thread
 import time
 import shlex
+import signal
+import locale
+import asyncio
+import threading
+import json
+import csv
+import gzip
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from versuchung.tools import AdviceManager, Advice
 from multiprocessing import cpu_count as __cpu_count
 
@@ -51,6 +56,25 @@ class CommandFailed(RuntimeError):
     def __str__(self):
         return self.repr + "\n\nSTDOUT:\n" + self.stdout
 
+class CommandsFailed(CommandFailed):
+    """ Indicates that some of the commands of :func:`shell_parallel` failed
+
+    Attributes:
+        failed: list of :exc:`CommandFailed` for the failed commands
+
+        results: list of ``(stdout, returncode)`` for all commands
+    """
+    def __init__(self, failed, results):
+        CommandFailed.__init__(self, [x.command for x in failed],
+                               failed[0].returncode)
+        self.failed = failed
+        self.results = results
+        self.repr = "%d of %d commands failed to execute:\n  " % (len(failed), len(results)) \
+            + "\n  ".join([x.repr for x in failed])
+    def __str__(self):
+        return "\n\n".join([self.repr] + ["%s\nSTDOUT:\n%s" % (x.command, x.stdout)
+                                          for x in self.failed])
+
 def quote_args(args):
     if len(args) == 1 and type(args[0]) == dict:
         ret = {}
@@ -64,33 +88,104 @@ def quote_args(args):
     return args
 
 
-def __shell(failok, command, *args, **kwargs):
+def __format_command(command, args):
     os.environ["LC_ALL"] = "C"
 
     args = quote_args(args)
-    command = command % args
+    return command % args
+
+def __popen(command, args, kwargs):
+    command = __format_command(command, args)
 
     options = {'stdout': PIPE, 'stderr': STDOUT,
                'shell': True, 'universal_newlines': True}
     options.update(**kwargs)
 
     logging.debug("executing: " + command)
-    p = Popen(command, **options)
-    stdout = ""
-    while True:
-        x = p.stdout.readline()
-        if not x:
-            break
-        stdout += x
+    return command, Popen(command, **options)
+
+def __readlines(p):
+    """Yield the lines of the child's output without the trailing newline"""
+    for x in iter(p.stdout.readline, ""):
         logging.debug("stdout|%s", x.replace("\n", ""))
-    p.wait()
-    if len(stdout) > 0 and stdout[-1] == '\n':
-        stdout = stdout[:-1]
+        if x[-1] == "\n":
+            x = x[:-1]
+        yield x
+
+def _stream_function(stream):
+    if callable(stream):
+        return stream
+    return lambda line: stream.write(line + "\n")
+
+# Resource usage of the last command executed by shell() in this thread
+_last_rusage = threading.local()
+
+def __wait(p):
+    """Wait for the child with os.wait4() to get its resource usage
+    (including its waited-for descendants)."""
+    (pid, status, rusage) = os.wait4(p.pid, 0)
+    if os.WIFSIGNALED(status):
+        p.returncode = -os.WTERMSIG(status)
+    else:
+        p.returncode = os.WEXITSTATUS(status)
+    return rusage
+
+def __shell(failok, command, *args, **kwargs):
+    stream = kwargs.pop("stream", None)
+    start = time.time()
+    command, p = __popen(command, args, kwargs)
+    if stream is None:
+        stdout = list(__readlines(p))
+    else:
+        stream = _stream_function(stream)
+        stdout = []
+        for line in __readlines(p):
+            stream(line)
+    rusage = __wait(p)
+    _last_rusage.value = {
+        "returncode": p.returncode,
+        "wall_time": time.time() - start,
+        "user_time": rusage.ru_utime,
+        "system_time": rusage.ru_stime,
+        "max_rss": rusage.ru_maxrss,
+        "minor_page_faults": rusage.ru_minflt,
+        "major_page_faults": rusage.ru_majflt,
+        "voluntary_context_switches": rusage.ru_nvcsw,
+        "involuntary_context_switches": rusage.ru_nivcsw,
+    }
 
     if not failok and p.returncode != 0:
-        raise CommandFailed(command, p.returncode, stdout)
+        raise CommandFailed(command, p.returncode, "\n".join(stdout))
+
+    if stream is None and not stdout:
+        stdout = [""]
+    return (stdout, p.returncode)
+
+
+def shell_iter(command, *args, **kwargs):
+    """Like :meth:`.shell`, but returns a generator that yields the
+    lines of the command's standard output while the command is
+    running. After the last line, :exc:`CommandFailed` is raised if
+    the returncode is != 0.
+
+    >>> for line in shell_iter("make -C %s", path):
+    ...     print(line)
+
+    .. note::
 
-    return (stdout.__str__().rsplit('\n'), p.returncode)
+      The output is neither stored nor tracked with ``shell.track``.
+    """
+    command, p = __popen(command, args, kwargs)
+    try:
+        for line in __readlines(p):
+            yield line
+    finally:
+        if p.poll() is None:
+            p.kill()
+        p.stdout.close()
+        p.wait()
+    if p.returncode != 0:
+        raise CommandFailed(command, p.returncode)
 
 
 @AdviceManager.advicable
@@ -115,7 +210,7 @@ def shell(command, *args, **kwargs):
     .. note::
 
       The following command enables capturing `stderr`, `stdout` and
-      runtime information (with `/usr/bin/env time`)::
+      the resource usage of every command::
 
         shell.track(experiment.path)
 
@@ -127,8 +222,11 @@ def shell(command, *args, **kwargs):
       >> shell.track.disable()
       >> shell.track.enable()
 
-      The tracking feature creates files like ``shell_0_time``,
-      ``shell_0_stderr``, and so on. These files are created in the
+      The tracking feature creates files like ``shell_0_stdout``,
+      ``shell_0_stderr``, and so on. The resource usage (wall, user
+      and system time, maximal RSS in KiB, page faults and context
+      switches) of all commands is appended as one JSON object per
+      line to ``shell_rusage.jsonl``. These files are created in the
       ``experiment.path`` directory.
 
     .. note::
@@ -140,6 +238,18 @@ def shell(command, *args, **kwargs):
         shell.track(experiment.path)
 
 
+    .. note::
+
+      With the ``stream`` keyword argument, the output lines are
+      delivered while the command is running instead of being
+      collected. ``stream`` is either a function that is called with
+      every line, or a file object the lines are written to::
+
+        with open(os.path.join(self.path, "build.log"), "w") as fd:
+            shell("make -C %s", path, stream=fd)
+
+      In this case, the returned list of lines is empty.
+
     :rtype: a tuple with:
 
         1. the command's standard output as list of lines
@@ -155,18 +265,157 @@ def shell_failok(command, *args, **kwargs):
     return __shell(True, command, *args, **kwargs)
 
 
+def shell_parallel(commands, jobs=cpu_count, **kwargs):
+    """Executes many commands with :meth:`.shell` concurrently. At
+    most ``jobs`` commands are running at the same time. Every command
+    is either a string or a tuple of the command and its arguments;
+    the keyword arguments are passed to every command::
+
+        shell_parallel([("./bench %s", x) for x in inputs], jobs=8)
+
+    All commands are executed, even if some of them fail. With
+    ``shell.track``, every command gets its own ``shell_N_*`` files.
+
+    :rtype: a list of ``(stdout, returncode)`` tuples in the order of the commands
+
+    :raises: :exc:`CommandsFailed` if any of the returncodes is != 0
+    """
+    def run(command):
+        if type(command) not in (list, tuple):
+            command = (command,)
+        try:
+            return shell(*command, **kwargs)
+        except CommandFailed as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(run, commands))
+
+    failed = [x for x in results if isinstance(x, CommandFailed)]
+    results = [(x.stdout.split("\n"), x.returncode)
+               if isinstance(x, CommandFailed) else x
+               for x in results]
+    if failed:
+        raise CommandsFailed(failed, results)
+    return results
+
+
+async def __ashell(failok, command, *args, timeout=None, stream=None, **kwargs):
+    command = __format_command(command, args)
+
+    options = {'stdout': asyncio.subprocess.PIPE,
+               'stderr': asyncio.subprocess.STDOUT,
+               'start_new_session': True}
+    options.update(**kwargs)
+
+    logging.debug("executing: " + command)
+    p = await asyncio.create_subprocess_shell(command, **options)
+    encoding = locale.getpreferredencoding(False)
+    stdout = []
+    if stream is not None:
+        stream = _stream_function(stream)
+
+    def emit(line):
+        line = line.decode(encoding)
+        logging.debug("stdout|%s", line)
+        if stream is None:
+            stdout.append(line)
+        else:
+            stream(line)
+
+    async def communicate():
+        # StreamReader.readline() fails for lines longer than its
+        # buffer limit, therefore, we split the lines ourselves.
+        pending = []
+        while True:
+            chunk = await p.stdout.read(1 << 16)
+            if not chunk:
+                break
+            lines = chunk.split(b"\n")
+            if len(lines) > 1:
+                emit(b"".join(pending + [lines[0]]))
+                for line in lines[1:-1]:
+                    emit(line)
+                pending = []
+            pending.append(lines[-1])
+        rest = b"".join(pending)
+        if rest:
+            emit(rest)
+        await p.wait()
+
+    try:
+        await asyncio.wait_for(communicate(), timeout)
+    except BaseException:
+        # Timeout or cancellation: kill the whole process group
+        if p.returncode is None:
+            logging.debug("killing: " + command)
+            try:
+                os.killpg(p.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await asyncio.shield(p.wait())
+        raise
+
+    if not failok and p.returncode != 0:
+        raise CommandFailed(command, p.returncode, "\n".join(stdout))
+
+    if stream is None and not stdout:
+        stdout = [""]
+    return (stdout, p.returncode)
+
+
+@AdviceManager.advicable
+async def ashell(command, *args, **kwargs):
+    """Like :meth:`.shell`, but as an :mod:`asyncio` coroutine. The
+    command is started with ``asyncio.create_subprocess_shell()`` in
+    its own process group, so many commands can be orchestrated from
+    a single thread::
+
+        server = asyncio.ensure_future(ashell("./server"))
+        clients = [ashell("./client %s", str(i), timeout=60) for i in range(100)]
+        await asyncio.gather(*clients)
+
+    With ``timeout`` (in seconds) the command is killed after the
+    given time and :exc:`asyncio.TimeoutError` is raised. If the
+    coroutine is cancelled, the process group is killed as well.
+
+    :rtype: a tuple with:
+
+        1. the command's standard output as list of lines
+        2. the exitcode
+
+    :raises: :exc:`CommandFailed` if the returncode is != 0
+    """
+    return await __ashell(False, command, *args, **kwargs)
+
+@AdviceManager.advicable
+async def ashell_failok(command, *args, **kwargs):
+    """Like :meth:`.ashell`, but the throws no exception"""
+    return await __ashell(True, command, *args, **kwargs)
+
+
 def add_sys_path(path):
     """Add path to the PATH environment variable"""
     os.environ["PATH"] = path + ":" + os.environ["PATH"]
 
 class AdviceShellTracker(Advice):
+    rusage_filename = "shell_rusage.jsonl"
+
     def __call__(self, base_directory):
         self.base_directory = base_directory
         assert os.path.isdir(base_directory)
         self.count = 0
+        self.lock = threading.Lock()
         # Enable the Advice
         self.enable()
-        
+
+    def relocate(self, old, new):
+        """Follow the tracked directory after ``old`` was renamed to
+        ``new`` (e.g., when the result set is published)"""
+        base = getattr(self, "base_directory", None)
+        if base == old or (base and base.startswith(old + os.sep)):
+            self.base_directory = new + base[len(old):]
+
     def around(self, func, args, kwargs):
         assert len(args) > 0
         command = args[0]
@@ -174,16 +423,37 @@ class AdviceShellTracker(Advice):
         args = versuchung.execute.quote_args(list(args)[1:])
         command = command % args
 
-        cmd = "/usr/bin/env time --verbose -o %s_time sh -c %s 2> %s_stderr"
-        base = os.path.join(self.base_directory, "shell_%d" % self.count)
-        self.count += 1
-        args = tuple([cmd, base, command, base])
+        with self.lock:
+            index = self.count
+            self.count += 1
+        base = os.path.join(self.base_directory, "shell_%d" % index)
+        # Group the command to redirect stderr without an extra process
+        cmd = "{ " + command.replace("%", "%%") + "\n} 2> %s"
+        args = tuple([cmd, base + "_stderr"])
 
-        # Dump away stdout
-        ret = func(args, kwargs)
-        with open(base + "_stdout", "w+") as fd:
-            fd.write("\n".join(ret[0]) + "\n")
-        return ret
+        versuchung.execute._last_rusage.value = None
+        try:
+            # Dump away stdout
+            if "stream" in kwargs:
+                stream = versuchung.execute._stream_function(kwargs["stream"])
+                with open(base + "_stdout", "w+") as fd:
+                    def tee(line):
+                        fd.write(line + "\n")
+                        stream(line)
+                    kwargs = dict(kwargs, stream=tee)
+                    return func(args, kwargs)
+            ret = func(args, kwargs)
+            with open(base + "_stdout", "w+") as fd:
+                fd.write("\n".join(ret[0]) + "\n")
+            return ret
+        finally:
+            rusage = versuchung.execute._last_rusage.value
+            if rusage:
+                record = {"index": index, "command": command}
+                record.update(rusage)
+                with self.lock:
+                    with open(os.path.join(self.base_directory, self.rusage_filename), "a") as fd:
+                        fd.write(json.dumps(record) + "\n")
 
 shell.track =        AdviceShellTracker("versuchung.execute.shell")
 shell_failok.track = AdviceShellTracker("versuchung.execute.shell_failok")
@@ -224,12 +494,94 @@ class MachineMonitor(CSV_File):
      [1326548339.119982, 2],
      ....
 
+    The samples are written to the csv file every ``flush_interval``
+    milliseconds while the experiment is running, so a crash does not
+    lose the whole trace. With ``compressed=True`` the csv file is
+    gzip compressed. By default, all samples are also kept in
+    :attr:`value`; with ``keep_samples=N`` only the last N samples
+    are kept in memory during the experiment (ring buffer).
+
+    Besides the system wide values, the following sources can be
+    given in ``capture``. Their columns are appended to
+    :attr:`sample_keys`:
+
+    - ``proc`` -- cpu usage, RSS and number of processes of the
+      experiment's process tree (e.g., all commands started with
+      :func:`shell`).
+    - ``cgroup`` -- cpu time (in microseconds), current memory and
+      read/written bytes of the cgroup-v2 given with ``cgroup``
+      (either a path or a name relative to the cgroup mount). If no
+      cgroup is given, the cgroup of the experiment is used.
+    - ``percpu`` -- the cpu utilisation of every core.
     """
-    def __init__(self, default_filename = "", tick_interval=100, capture = ["cpu", "mem", "net", "disk"]):
+
+    proc_keys = ["proc_cpu_percentage", "proc_rss", "proc_count"]
+    cgroup_keys = ["cgroup_cpu_usec", "cgroup_memory", "cgroup_io_read", "cgroup_io_write"]
+
+    def __init__(self, default_filename = "", tick_interval=100, capture = ["cpu", "mem", "net", "disk"],
+                 flush_interval=1000, compressed=False, keep_samples=None, cgroup=None):
         CSV_File.__init__(self, default_filename)
         self.tick_interval = tick_interval
-        self.__running = True
+        self.flush_interval = flush_interval
+        self.compressed = compressed
+        self.keep_samples = keep_samples
         self.capture = capture
+        self.cgroup = cgroup
+        self.sample_keys = list(MachineMonitor.sample_keys)
+        if "proc" in capture:
+            self.sample_keys += self.proc_keys
+        if "cgroup" in capture:
+            self.sample_keys += self.cgroup_keys
+        if "percpu" in capture:
+            self.cpus = os.cpu_count() or 1
+            self.sample_keys += ["cpu_percentage_%d" % i for i in range(self.cpus)]
+        self.__procs = {}
+        self.__samples = None
+        self.__decompressed = None
+        self.__batch = []
+        # Created in before_experiment_run, locks cannot be deep copied
+        self.__lock = None
+        self.__stop = None
+        self.__fd = None
+
+    @property
+    def value(self):
+        """While the experiment is running, the samples kept in
+        memory. Otherwise, the content of the csv file."""
+        if self.__samples is not None:
+            return self.__samples
+        if not self.compressed:
+            return CSV_File.value.fget(self)
+        if self.__decompressed is None:
+            with gzip.open(self.original_path, "rt") as fd:
+                self.__decompressed = self.after_read(fd.read())
+        return self.__decompressed
+
+    @value.setter
+    def value(self, value):
+        CSV_File.value.fset(self, value)
+
+    def open_csv(self):
+        if self.compressed:
+            return gzip.open(self.original_path, "rt", newline="")
+        return CSV_File.open_csv(self)
+
+    def append(self, row):
+        if self.__samples is None:
+            return CSV_File.append(self, row)
+        with self.__lock:
+            self.__samples.append(row)
+            self.__batch.append(row)
+
+    def flush(self):
+        """Write the samples, which were captured since the last
+        flush, to the csv file."""
+        if self.__fd is None:
+            return CSV_File.flush(self)
+        with self.__lock:
+            self.__writer.writerows(self.__batch)
+            self.__batch = []
+            self.__fd.flush()
 
     def __get_cpu(self):
         return [self.psutil.cpu_percent()]
@@ -263,14 +615,84 @@ class MachineMonitor(CSV_File):
         return ret
 
 
-    def monitor_thread(self):
+    def __get_proc(self):
+        procs = {}
+        for p in self.psutil.Process(os.getpid()).children(recursive=True):
+            # Keep the process objects for cpu_percent() between two ticks
+            procs[p.pid] = self.__procs.get(p.pid, p)
+        self.__procs = procs
+
+        cpu, rss = 0, 0
+        for p in procs.values():
+            try:
+                cpu += p.cpu_percent()
+                rss += p.memory_info().rss
+            except self.psutil.Error:
+                pass
+        return [cpu, rss, len(procs)]
+
+    def __cgroup_path(self):
+        """Path of the monitored cgroup-v2. None, if the experiment
+        does not run in a cgroup-v2 (e.g., cgroup-v1 only hosts)."""
+        mount = "/sys/fs/cgroup"
+        # Hybrid hierarchy: cgroup-v2 is mounted at unified/
+        if not os.path.exists(os.path.join(mount, "cgroup.controllers")):
+            mount = os.path.join(mount, "unified")
+        cgroup = self.cgroup
+        if cgroup is None:
+            with open("/proc/self/cgroup") as fd:
+                for line in fd:
+                    if line.startswith("0::"):
+                        cgroup = line[3:].strip()
+            if cgroup is None:
+                logging.warning("MachineMonitor: no cgroup-v2 found, cgroup columns are -1")
+                return None
+        if os.path.isabs(cgroup) and os.path.exists(cgroup):
+            return cgroup
+        return os.path.join(mount, cgroup.lstrip("/"))
+
+    def __read_cgroup(self, filename):
+        """Read a file of the cgroup. None, if the file is not available."""
+        if self.cgroup_path is None:
+            return None
         try:
-            import psutil
-            self.psutil = psutil
-        except ImportError:
-            raise RuntimeError("Please install psutil to use PsMonitor")
+            with open(os.path.join(self.cgroup_path, filename)) as fd:
+                return fd.read()
+        except IOError:
+            return None
+
+    def __get_cgroup(self):
+        stat = self.__read_cgroup("cpu.stat")
+        cpu = -1
+        if stat is not None:
+            cpu = int(dict([l.split() for l in stat.splitlines()])["usage_usec"])
+
+        memory = self.__read_cgroup("memory.current")
+        memory = int(memory) if memory is not None else -1
+
+        io = self.__read_cgroup("io.stat")
+        rbytes, wbytes = -1, -1
+        if io is not None:
+            rbytes, wbytes = 0, 0
+            for line in io.splitlines():
+                fields = dict([x.split("=") for x in line.split()[1:]])
+                rbytes += int(fields.get("rbytes", 0))
+                wbytes += int(fields.get("wbytes", 0))
+
+        old = self.__old_cgroup_stat
+        if old is None:
+            old = (cpu, rbytes, wbytes)
+        self.__old_cgroup_stat = (cpu, rbytes, wbytes)
+        delta = lambda new, old: new - old if new >= 0 else -1
+        return [delta(cpu, old[0]), memory, delta(rbytes, old[1]), delta(wbytes, old[2])]
+
+    def __get_percpu(self):
+        ret = self.psutil.cpu_percent(percpu=True)[:self.cpus]
+        return ret + [-1] * (self.cpus - len(ret))
 
-        while self.__running:
+    def monitor_thread(self):
+        last_flush = time.time()
+        while True:
             row = [time.time()]
             if "cpu" in self.capture:
                 row += self.__get_cpu()
@@ -292,11 +714,24 @@ class MachineMonitor(CSV_File):
             else:
                 row += [-1,-1]
 
+            if "proc" in self.capture:
+                row += self.__get_proc()
+
+            if "cgroup" in self.capture:
+                row += self.__get_cgroup()
+
+            if "percpu" in self.capture:
+                row += self.__get_percpu()
+
             assert len(row) == len(self.sample_keys)
             self.append(row)
 
+            if (row[0] - last_flush) * 1000.0 >= self.flush_interval:
+                self.flush()
+                last_flush = row[0]
 
-            time.sleep(self.tick_interval/1000.0)
+            if self.__stop.wait(self.tick_interval/1000.0):
+                break
 
     def inp_extract_cmdline_parser(self, opts, args):
         CSV_File.inp_parser_extract(self, opts, None)
@@ -304,17 +739,45 @@ class MachineMonitor(CSV_File):
 
     def before_experiment_run(self, parameter_type):
         if parameter_type == "output":
+            try:
+                import psutil
+                self.psutil = psutil
+            except ImportError:
+                raise RuntimeError("Please install psutil to use MachineMonitor")
+
             CSV_File.before_experiment_run(self, "output")
             self.event_file = CSV_File(self.path + ".events")
             self.event_file.before_experiment_run("output")
-            self.thread = thread.start_new_thread(self.monitor_thread, tuple())
+
+            if "cgroup" in self.capture:
+                self.cgroup_path = self.__cgroup_path()
+                self.__old_cgroup_stat = None
+
+            if self.keep_samples is None:
+                self.__samples = []
+            else:
+                self.__samples = collections.deque(maxlen=self.keep_samples)
+            if self.compressed:
+                self.__fd = gzip.open(self.original_path, "wt")
+            else:
+                self.__fd = open(self.original_path, "w")
+            self.__writer = csv.writer(self.__fd, **self.csv_args)
+
+            self.__lock = threading.Lock()
+            self.__stop = threading.Event()
+            self.thread = threading.Thread(target=self.monitor_thread, daemon=True)
+            self.thread.start()
 
     def after_experiment_run(self, parameter_type):
         if parameter_type == "output":
-            self.__running = False
-            time.sleep(self.tick_interval/1000.0)
-            CSV_File.after_experiment_run(self, "output")
+            self.__stop.set()
+            self.thread.join()
+            self.flush()
+            self.__fd.close()
+            self.__fd = None
             self.event_file.after_experiment_run("output")
+            self.__samples = None
+        CSV_File.after_experiment_run(self, parameter_type)
 
 
     sample_keys = ["time", "cpu_percentage",
@@ -325,7 +788,8 @@ class MachineMonitor(CSV_File):
 
     """The various fields in the csv file are organized like the
     strings in this list. E.g. The unix time is the first field of the
-    csv file."""
+    csv file. The columns of additional capture sources are appended
+    to the sample_keys of the monitor instance."""
 
 
     def extract(self, keys = ["time", "cpu_percentage"]):
@@ -340,3 +804,58 @@ class MachineMonitor(CSV_File):
                 r.append(row[index])
             ret.append(r)
         return ret
+
+    def extract_array(self, keys = ["time", "cpu_percentage"]):
+        """Like :meth:`extract`, but returns a two dimensional
+        ``numpy.ndarray`` of floats (one row per sample). Like
+        :attr:`value`, it uses the samples in memory while the
+        experiment is running."""
+        import numpy
+        indices = [self.sample_keys.index(x) for x in keys]
+        if self.__samples is not None:
+            # While the experiment is running, use the samples in memory
+            with self.__lock:
+                samples = list(self.__samples)
+            rows = [[row[i] for i in indices] for row in samples]
+        else:
+            rows = self.iter_rows(indices, float)
+        data = numpy.array(list(rows), dtype=float)
+        return data.reshape((len(data), len(keys)))
+
+    def resample(self, keys = ["cpu_percentage"], window = 1000, aggregate = "mean"):
+        """Aggregate the samples in time windows of ``window``
+        milliseconds. ``aggregate`` is one of ``"mean"``, ``"sum"``,
+        ``"min"``, ``"max"`` or a percentile (e.g. ``95``).
+
+        :return: ``numpy.ndarray`` -- one row per window, the first
+          column is the start time of the window, followed by the
+          aggregated keys.
+
+        >>> experiment.o.ps.resample(["cpu_percentage"], window=500, aggregate=95)
+        array([[1.32654834e+09, 1.25e+01],
+               [1.32654834e+09, 3.00e+00],
+               ....
+        """
+        import numpy
+        data = self.extract_array(["time"] + keys)
+        if len(data) == 0:
+            return numpy.empty((0, len(keys) + 1))
+        time, data = data[:, 0], data[:, 1:]
+        bins = numpy.floor((time - time[0]) * 1000.0 / window)
+        starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(bins)) + 1))
+
+        if aggregate in ("mean", "sum"):
+            values = numpy.add.reduceat(data, starts, axis=0)
+            if aggregate == "mean":
+                counts = numpy.diff(numpy.append(starts, len(data)))
+                values = values / counts[:, None]
+        elif aggregate == "min":
+            values = numpy.minimum.reduceat(data, starts, axis=0)
+        elif aggregate == "max":
+            values = numpy.maximum.reduceat(data, starts, axis=0)
+        else:
+            values = numpy.array([numpy.percentile(x, aggregate, axis=0)
+                                  for x in numpy.split(data, starts[1:])])
+
+        window_start = time[0] + bins[starts] * window / 1000.0
+        return numpy.column_stack((window_start, values))
@@ -22,19 +22,100 @@ from versuchung.files import Directory
 from versuchung.tools import JavascriptStyleDictAccess, setup_logging
 import sys
 import os.path
-import glob
+import errno
+import fcntl
 import hashlib
 import json
 import shutil
 import copy
 import tempfile
 import signal
+import itertools
+import multiprocessing
+import traceback
+try:
+    from queue import Empty
+except ImportError:
+    from Queue import Empty
 
 LambdaType = type(lambda x:x)
 
 class ExperimentError(Exception):
     pass
 
+def sweep_points(grid):
+    """Expand a parameter grid into a list of keyword argument
+    dicts. A ``dict`` is expanded to the cartesian product of its
+    values (single values are used for every point), a ``list`` of
+    dicts is taken as it is.
+
+    >>> sweep_points({"a": ["1", "2"], "b": "x"})
+    [{'a': '1', 'b': 'x'}, {'a': '2', 'b': 'x'}]
+    """
+    if type(grid) == dict:
+        keys = list(grid.keys())
+        values = [grid[k] if type(grid[k]) in (list, tuple) else [grid[k]]
+                  for k in keys]
+        return [dict(zip(keys, x)) for x in itertools.product(*values)]
+    return [dict(x) for x in grid]
+
+def _execute_worker(queue, token, experiment, kwargs):
+    try:
+        identifier = experiment.execute([], **kwargs)
+        queue.put((token, identifier, None))
+    except (Exception, SystemExit) as e:
+        logging.debug(traceback.format_exc())
+        queue.put((token, None, "%s: %s" % (type(e).__name__, e)))
+
+class ExecutionPool:
+    """Executes experiments in forked worker processes, at most
+    ``jobs`` (default: number of cpus) at the same time. Forking
+    avoids pickling the experiment objects and gives every execution
+    its own working directory and global state."""
+
+    def __init__(self, jobs=None):
+        from versuchung.execute import cpu_count
+        self.jobs = jobs or cpu_count
+        self.__ctx = multiprocessing.get_context("fork")
+        self.__queue = self.__ctx.Queue()
+        self.__running = {}
+        self.__tokens = itertools.count()
+
+    def __len__(self):
+        return len(self.__running)
+
+    def full(self):
+        return len(self.__running) >= self.jobs
+
+    def submit(self, key, experiment, kwargs):
+        """Start ``experiment.execute(**kwargs)`` in a new worker. The
+        key identifies the execution in the result of :meth:`wait`."""
+        token = next(self.__tokens)
+        p = self.__ctx.Process(target=_execute_worker,
+                               args=(self.__queue, token, experiment, kwargs))
+        p.start()
+        self.__running[token] = (key, p)
+
+    def wait(self):
+        """Wait for the next worker to finish.
+
+        :return: tuple -- (key, result set identifier, error). The
+          identifier is ``None`` and error is a string, if the
+          execution failed."""
+        assert len(self.__running) > 0
+        while True:
+            try:
+                (token, identifier, error) = self.__queue.get(timeout=1)
+                (key, p) = self.__running.pop(token)
+                p.join()
+                return (key, identifier, error)
+            except Empty:
+                # Workers that died without sending a result
+                for token, (key, p) in list(self.__running.items()):
+                    if p.exitcode not in (None, 0):
+                        del self.__running[token]
+                        return (key, None, "worker exited with %d" % p.exitcode)
+
 class Experiment(Type, InputParameter):
     """Can be used as: **input parameter**"""
 
@@ -101,6 +182,8 @@ class Experiment(Type, InputParameter):
 
     tmp_directory = None
 
+    __reused = False
+
     # Override base_directory from versuchung.types.Type
     base_directory = None
 
@@ -221,6 +304,10 @@ class Experiment(Type, InputParameter):
         self.__parser.add_argument('--title',
                                    dest='title',
                                    help="custom title of the experiment (default: Experiment class-name)")
+        self.__parser.add_argument('--reuse',
+                                   dest='reuse', action='store_true',
+                                   help="reuse an already finished result set with the same hash",
+                                   default=False)
 
         for (name, inp) in self.inputs.items():
             if type(inp) == LambdaType:
@@ -248,6 +335,23 @@ class Experiment(Type, InputParameter):
 
         >>> experiment.execute(["--input_parameter", "foo"])
         >>> experiment.execute(input_parameter="foo")
+
+        If ``reuse=True`` (or ``--reuse``) is given and a finished
+        result set with the same metadata hash already exists, the
+        :meth:`run` method is skipped and the identifier of the
+        existing result set is returned:
+
+        >>> experiment.execute(input_parameter="foo", reuse=True)
+
+        While the experiment is running, the result set is written to
+        a hidden staging directory (``.<identifier>.staging-*``) next
+        to its final location, which is also the :attr:`path` during
+        :meth:`run`. After the experiment has finished, the complete
+        result set is moved to its final location with a rename. A
+        crashed experiment therefore never leaves a partial result
+        set behind, only its staging directory. Such stale staging
+        directories are removed by the next run of the same
+        identifier.
         """
         self.execute_setup(args, **kwargs)
         self.execute_run()
@@ -256,6 +360,8 @@ class Experiment(Type, InputParameter):
     def execute_setup(self, args=[], **kwargs):
         self.dynamic_experiment = self
         self.startup_directory = os.path.abspath(os.curdir)
+        self.__reused = False
+        self.__staging_lock = None
 
         self.subobjects.update()
 
@@ -276,18 +382,25 @@ class Experiment(Type, InputParameter):
         self.before_experiment_run("output")
 
     def execute_run(self):
+        if self.__reused:
+            logging.info("Reusing result set %s", self.__experiment_instance)
+            return
+
         # Goto the output directory
         os.chdir(self.base_directory)
         try:
             self.run()
-        except RuntimeError as e:
-            # Clean up the tmp directory
-            if self.suspend_on_error:
-                print(str(e))
-                print("tmp-dir: %s" % self.tmp_directory.path)
-                self.suspend_python()
-            logging.error("Removing tmp directory")
-            shutil.rmtree(self.tmp_directory.path)
+        except BaseException as e:
+            if isinstance(e, RuntimeError):
+                # Clean up the tmp directory
+                if self.suspend_on_error:
+                    print(str(e))
+                    print("tmp-dir: %s" % self.tmp_directory.path)
+                    self.suspend_python()
+                logging.error("Removing tmp directory")
+                shutil.rmtree(self.tmp_directory.path)
+            self.__unlock_staging()
+            logging.error("Unfinished result set remains in %s", self.base_directory)
             raise e
         finally:
             os.chdir(self.startup_directory)
@@ -302,6 +415,48 @@ class Experiment(Type, InputParameter):
         """:return: string -- directory name of the produced experiment results"""
         return self.__experiment_instance
 
+    def sweep(self, grid, jobs=None, **kwargs):
+        """Execute the experiment for every point of a parameter
+        grid. Each point is executed with :meth:`execute` in its own
+        worker process, with at most ``jobs`` (default: number of
+        cpus) processes running in parallel. The grid is expanded with
+        :func:`sweep_points`, additional keyword arguments are passed
+        to every point.
+
+        A failing point is logged as soon as it fails, but does not
+        abort the sweep.
+
+        :return: list -- result set identifiers in the order of the
+          points. Failed points are ``None``.
+
+        >>> experiment.sweep({"input_parameter": ["foo", "bar"]}, jobs=2, reuse=True)
+        ['SimpleExperiment-6b2f...', 'SimpleExperiment-0d35...']
+        """
+        points = sweep_points(grid)
+        results = [None] * len(points)
+        pool = ExecutionPool(jobs)
+
+        def collect():
+            (i, results[i], error) = pool.wait()
+            if error:
+                logging.error("sweep point %d %s failed: %s", i, points[i], error)
+
+        for index, point in enumerate(points):
+            while pool.full():
+                collect()
+            args = dict(kwargs)
+            args.update(point)
+            pool.submit(index, self, args)
+        while len(pool) > 0:
+            collect()
+        return results
+
+    @property
+    def reused(self):
+        """:return: bool -- True, if the last execution did not call
+        :meth:`run`, but reused an already finished result set"""
+        return self.__reused
+
     __call__ = execute
     """A experiment can also executed by calling it, :attr:`execute`
     will be called.
@@ -347,6 +502,8 @@ class Experiment(Type, InputParameter):
             obj.before_experiment_run("input")
 
         self.__calculate_metadata()
+        if self.__reused:
+            return
 
         for obj in self.outputs.values():
             obj.before_experiment_run("output")
@@ -372,17 +529,25 @@ class Experiment(Type, InputParameter):
 
 
         if os.path.exists(self.base_directory):
-            logging.info("Removing all files from existing output directory")
-            for f in glob.glob(os.path.join(self.base_directory, '*')):
-                if os.path.isdir(f):
-                    shutil.rmtree(f)
-                else:
-                    os.unlink(f)
-
-        try:
-            os.mkdir(self.base_directory)
-        except OSError:
-            pass
+            if self.__opts.reuse and self.__result_set_finished():
+                self.__reused = True
+                return
+
+        # The result set is written into a hidden staging directory
+        # next to its final location. It is published by
+        # __publish_result_set(), when the experiment has finished.
+        self.__result_directory = self.base_directory
+        self.__remove_stale_staging()
+        self.base_directory = tempfile.mkdtemp(
+            prefix="." + self.__experiment_instance + ".staging-",
+            dir=os.path.dirname(self.__result_directory))
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(self.base_directory, 0o777 & ~umask)
+        # The lock marks the staging directory as in use, until the
+        # result set is published or the run failed.
+        self.__staging_lock = os.open(self.base_directory, os.O_RDONLY)
+        fcntl.flock(self.__staging_lock, fcntl.LOCK_EX)
 
         # Here the hash is already calculated, so we can change the
         # metadata nonconsitent
@@ -396,6 +561,86 @@ class Experiment(Type, InputParameter):
 
         self.__metadata = metadata
 
+    def __remove_stale_staging(self):
+        """Remove the staging directories of earlier runs with the
+        same identifier that crashed or failed. Staging directories of
+        running experiments are locked and stay untouched."""
+        directory = os.path.dirname(self.__result_directory)
+        prefix = "." + self.__experiment_instance + ".staging-"
+        for name in os.listdir(directory):
+            if not name.startswith(prefix):
+                continue
+            path = os.path.join(directory, name)
+            if ".old-" not in name:
+                # Replaced result sets (.old-*) are always garbage
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except OSError:
+                    continue
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    # Directories without metadata are just being set up
+                    stale = os.path.exists(os.path.join(path, "metadata"))
+                except OSError:
+                    stale = False
+                finally:
+                    os.close(fd)
+                if not stale:
+                    continue
+            logging.info("Removing stale staging directory %s", path)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def __unlock_staging(self):
+        if self.__staging_lock is not None:
+            os.close(self.__staging_lock)
+            self.__staging_lock = None
+
+    def __publish_result_set(self):
+        """Move the finished result set from the staging directory to
+        its final location. Readers never see a partially written
+        result set. However, an existing result set with the same
+        identifier is first moved aside and removed afterwards: Between
+        both renames, neither the old nor the new result set exists,
+        and a concurrent ``--reuse`` run may recompute it."""
+        staging = self.base_directory
+        final = self.__result_directory
+        replaced = []
+        while True:
+            try:
+                os.rename(staging, final)
+                break
+            except OSError as e:
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+            old = "%s.old-%s" % (staging, len(replaced))
+            try:
+                os.rename(final, old)
+                replaced.append(old)
+            except FileNotFoundError:
+                # Another process replaced the result set concurrently
+                pass
+        self.base_directory = final
+        self.__unlock_staging()
+        # The shell trackers still point into the staging directory
+        from versuchung.execute import shell, shell_failok
+        shell.track.relocate(staging, final)
+        shell_failok.track.relocate(staging, final)
+        for old in replaced:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def __result_set_finished(self):
+        """A result set is finished, if its metadata was written
+        completely at the end of a successful run."""
+        try:
+            with open(os.path.join(self.base_directory, "metadata"), "r") as fd:
+                metadata = json.load(fd)
+        except (IOError, ValueError):
+            return False
+        if "date-end" not in metadata:
+            return False
+        self.__metadata = metadata
+        return True
+
 
     def symlink_name(self):
         """If -s is given, this function returns the name of the symlink
@@ -407,15 +652,18 @@ class Experiment(Type, InputParameter):
     def after_experiment_run(self, parameter_type):
 
         if parameter_type == "output":
-            for (name, outp) in self.outputs.items():
-                outp.after_experiment_run("output")
+            if not self.__reused:
+                for (name, outp) in self.outputs.items():
+                    outp.after_experiment_run("output")
 
             for (name, inp) in self.inputs.items():
                 inp.after_experiment_run("input")
 
-            self.__metadata["date-end"] = str(datetime.datetime.now())
-            with open(os.path.join(self.base_directory, "metadata"), "w") as fd:
-                json.dump(self.__metadata, fd)
+            if not self.__reused:
+                self.__metadata["date-end"] = str(datetime.datetime.now())
+                with open(os.path.join(self.base_directory, "metadata"), "w") as fd:
+                    json.dump(self.__metadata, fd)
+                self.__publish_result_set()
 
             shutil.rmtree(self.tmp_directory.path)
 
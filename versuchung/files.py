@@ -22,8 +22,15 @@ except ImportError:
 import shutil
 import csv
 import os, stat
+import errno
 import hashlib
 import fnmatch
+import json
+import mmap
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 class FilesystemObject(InputParameter, OutputParameter, Type):
     def __init__(self, default_name=""):
@@ -79,6 +86,142 @@ class FilesystemObject(InputParameter, OutputParameter, Type):
         self.__enclosing_directory = base_directory
         self.__object_name         = object_name
 
+class ChecksumCache:
+    """Persistent cache of file checksums. An entry is valid as long
+    as the path, the inode, the size and the modification time of the
+    file are unchanged. The cache is stored as JSON file in the user's
+    cache directory (``$XDG_CACHE_HOME/versuchung/checksums.json``)."""
+
+    # Files that were modified just before they were hashed could be
+    # modified again within the resolution of the mtime.
+    racy_interval = 2
+
+    def __init__(self, filename=None):
+        if filename is None:
+            cache_dir = os.environ.get("XDG_CACHE_HOME",
+                                       os.path.expanduser("~/.cache"))
+            filename = os.path.join(cache_dir, "versuchung", "checksums.json")
+        self.filename = filename
+        self.__entries = None
+        self.__dirty = False
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        if self.__entries is None:
+            try:
+                with open(self.filename) as fd:
+                    self.__entries = json.load(fd)
+            except (IOError, OSError, ValueError):
+                self.__entries = {}
+        return self.__entries
+
+    @staticmethod
+    def hash_file(path, algorithm="md5", chunk_size=1 << 20):
+        """Hash the file in chunks of ``chunk_size`` bytes with one of
+        the algorithms from :mod:`hashlib` (e.g. md5, sha256, blake2b)"""
+        h = hashlib.new(algorithm)
+        with open(path, "rb") as fd:
+            for chunk in iter(lambda: fd.read(chunk_size), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def checksum(self, path, algorithm="md5"):
+        """:return: string -- checksum of the file, from the cache if possible"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        key = algorithm + ":" + path
+        stamp = [st.st_ino, st.st_size, st.st_mtime_ns]
+        with self.__lock:
+            entry = self.__load().get(key)
+        if entry and entry[:3] == stamp:
+            return entry[3]
+        digest = self.hash_file(path, algorithm)
+        if time.time() - st.st_mtime > self.racy_interval:
+            with self.__lock:
+                self.__load()[key] = stamp + [digest]
+                self.__dirty = True
+        return digest
+
+    def save(self):
+        """Write the cache back to disk, if it was changed. The cache
+        file is replaced atomically; errors are ignored, since the
+        cache is only an optimization."""
+        with self.__lock:
+            if not self.__dirty:
+                return
+            try:
+                directory = os.path.dirname(self.filename)
+                if not os.path.exists(directory):
+                    os.makedirs(directory)
+                (fd, tmp) = tempfile.mkstemp(dir=directory, prefix=".checksums")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self.__entries, f)
+                os.replace(tmp, self.filename)
+                self.__dirty = False
+            except (IOError, OSError):
+                pass
+
+checksum_cache = ChecksumCache()
+
+def file_checksum(path, algorithm="md5"):
+    """Calculate the checksum of a file with the given :mod:`hashlib`
+    algorithm. The file is hashed in chunks and the result is
+    remembered in the persistent :class:`ChecksumCache`, so unchanged
+    files are hashed only once.
+
+    >>> file_checksum("/usr/bin/gcc", "sha256")
+    'e3b0c44298fc1c149afbf4c8996fb924...'
+    """
+    digest = checksum_cache.checksum(path, algorithm)
+    checksum_cache.save()
+    return digest
+
+def tree_checksum(path, algorithm="sha256", filename_filter="*", jobs=None):
+    """Calculate a Merkle-style digest of a directory tree. The digest
+    of a directory covers the names and digests of all its entries;
+    only the direct entries of ``path`` are filtered with the
+    ``filename_filter`` glob. Symbolic links to directories and broken
+    links contribute their target, all other files their content.
+
+    The files are hashed in parallel by ``jobs`` threads and cached with
+    the :class:`ChecksumCache`, so unchanged files are not read
+    again. The tree itself is walked on every call, since the
+    modification time of a directory does not reflect changes deeper
+    in the tree."""
+    tree = {}
+    files = []
+    for (root, dirs, names) in os.walk(path):
+        if root == path:
+            dirs[:] = [x for x in dirs if fnmatch.fnmatch(x, filename_filter)]
+            names = [x for x in names if fnmatch.fnmatch(x, filename_filter)]
+        tree[root] = (sorted(dirs), sorted(names))
+        files += [os.path.join(root, x) for x in names
+                  if os.path.exists(os.path.join(root, x))]
+
+    from versuchung.execute import cpu_count
+    with ThreadPoolExecutor(max_workers=jobs or cpu_count) as pool:
+        digests = dict(zip(files, pool.map(lambda x: checksum_cache.checksum(x, algorithm),
+                                           files)))
+    checksum_cache.save()
+
+    def digest(root):
+        h = hashlib.new(algorithm)
+        (dirs, names) = tree[root]
+        for name in dirs:
+            p = os.path.join(root, name)
+            if p in tree:
+                h.update(("d %s\0%s\n" % (name, digest(p))).encode())
+            else:
+                h.update(("l %s\0%s\n" % (name, os.readlink(p))).encode())
+        for name in names:
+            p = os.path.join(root, name)
+            if p in digests:
+                h.update(("f %s\0%s\n" % (name, digests[p])).encode())
+            else:
+                h.update(("l %s\0%s\n" % (name, os.readlink(p))).encode())
+        return h.hexdigest()
+    return digest(path)
+
 class File(FilesystemObject):
     """Can be used as: **input parameter** and **output parameter**
 
@@ -91,11 +234,25 @@ class File(FilesystemObject):
     NB: The content of the file is flushed only after the experiment
     finishes.  Use :meth:`flush` to force writing the buffered data to
     disk before the experiment finishes.
+
+    With ``streaming=True``, the content is not buffered in memory,
+    but every :meth:`write` goes directly to an open (buffered) file
+    handle. Here, :meth:`flush` also syncs the written data to
+    disk. The ``with`` statement enables streaming temporarily and
+    closes the file afterwards::
+
+       with self.o.log as log:
+          for x in range(1000000):
+              log.write("%d\n" % x, append=True)
     """
 
-    def __init__(self, default_filename="", binary=False):
+    def __init__(self, default_filename="", binary=False, streaming=False):
         FilesystemObject.__init__(self, default_filename)
         self.__value = None
+        self.streaming = streaming
+        self.__fd = None
+        self.__truncate = True
+        self.__mmap = None
 
         self.__binary = binary
         if binary:
@@ -108,6 +265,16 @@ class File(FilesystemObject):
     def value(self):
         """This attribute can be read and written and represent the
         content of the specified file"""
+        if self.__fd is not None or (self.streaming and self.parameter_type != "input"):
+            # Streaming: Read back the current content without caching
+            # it, a cached value would be stale after the next write.
+            if self.__fd is not None:
+                self.__fd.flush()
+            try:
+                with open(self.original_path, "r" + self.__binary_mode) as fd:
+                    return self.after_read(fd.read())
+            except IOError:
+                return self.after_read("")
         if not self.__value:
             try:
                 with open(self.original_path, "r" + self.__binary_mode) as fd:
@@ -119,17 +286,94 @@ class File(FilesystemObject):
 
     @value.setter
     def value(self, value):
-        self.__value = value
+        self.__unmap()
+        if self.streaming:
+            File.write(self, value)
+        else:
+            self.__value = value
 
     @property
     def original_path(self):
         return File.path.fget(self)
 
+    def __mapping(self):
+        if self.__mmap is None:
+            with open(self.path, "rb") as fd:
+                if os.fstat(fd.fileno()).st_size == 0:
+                    return b""
+                self.__mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.__mmap
+
+    def __unmap(self):
+        if self.__mmap is not None:
+            try:
+                self.__mmap.close()
+            except BufferError:
+                # Views from buffer are still alive, the mapping is
+                # unmapped after the last one is gone.
+                pass
+            self.__mmap = None
+
+    @property
+    def buffer(self):
+        """A read-only ``memoryview`` of the file's content. The file is
+        memory mapped, so the data is neither copied nor read before
+        it is accessed. Large input files can be processed without
+        loading them into :attr:`value`. The mapping is dropped when
+        the file is written or closed.
+
+        >>> self.i.trace.buffer[:4].tobytes()
+        b'\\x7fELF'
+        """
+        return memoryview(self.__mapping())
+
+    def iter_lines(self, encoding="utf-8"):
+        """Iterate over the lines of the (memory mapped) file without
+        the trailing newline. Only the returned line is decoded with
+        ``encoding``; with ``encoding=None`` the lines are bytes."""
+        data = self.__mapping()
+        pos = 0
+        while pos < len(data):
+            end = data.find(b"\n", pos)
+            if end < 0:
+                end = len(data)
+            line = data[pos:end]
+            yield line.decode(encoding) if encoding else line
+            pos = end + 1
+
+    def open_stream(self, mode):
+        """Open the file handle for the streaming mode. ``mode`` is
+        either ``"w"`` or ``"a"``."""
+        return open(self.original_path, mode + self.__binary_mode)
+
+    def before_stream_write(self, value):
+        """Filter a chunk that is written in streaming mode. By
+        default, it is filtered by :meth:`before_write`."""
+        return self.before_write(value)
+
+    def __stream(self):
+        if self.__fd is None:
+            self.__fd = self.open_stream("w" if self.__truncate else "a")
+            self.__truncate = False
+        return self.__fd
+
     def write(self, content, append = False):
         """Similar to the :attr:`value` property. If the parameter
         `append` is `False`, then the property :attr:`value` is reset
         (i.e., overwritten), otherwise the content is appendend"""
-        if append:
+        self.__unmap()
+        if self.streaming:
+            if not append:
+                if self.__fd is not None:
+                    self.__fd.close()
+                    self.__fd = None
+                self.__truncate = True
+            fd = self.__stream()
+            # Filter every chunk on its own
+            chunk = self.before_stream_write(content)
+            if chunk:
+                fd.write(chunk)
+        elif append:
             self.value += content
         else:
             self.value = content
@@ -139,9 +383,15 @@ class File(FilesystemObject):
         assert parameter_type in ["input", "output"]
         if parameter_type == "output":
             self.flush()
+        self.close()
 
     def flush(self):
         """Flush the cached content of the file to disk"""
+        self.__unmap()
+        if self.__fd is not None:
+            self.__fd.flush()
+            os.fsync(self.__fd.fileno())
+            return
         if self.__value == None:
             return
         with open(self.original_path, "w" + self.__binary_mode + "+") as fd:
@@ -150,6 +400,29 @@ class File(FilesystemObject):
                 v = ""
             fd.write(v)
 
+    def close(self):
+        """Flush and close the file handle of a streaming file and
+        the memory mapping of :attr:`buffer`"""
+        self.__unmap()
+        if self.__fd is not None:
+            self.flush()
+            self.__fd.close()
+            self.__fd = None
+
+    def __enter__(self):
+        if self.__value is not None:
+            # Write the buffered content, before appending to it
+            self.flush()
+            self.__value = None
+            self.__truncate = False
+        self.__was_streaming = self.streaming
+        self.streaming = True
+        return self
+
+    def __exit__(self, *excinfo):
+        self.close()
+        self.streaming = self.__was_streaming
+
     def copy_contents(self, filename):
         """Read the given file and replace the current .value with the
         files content.
@@ -209,7 +482,7 @@ class Executable(File):
         raise NotImplementedError
 
     def inp_metadata(self):
-        return {self.name + "-md5": hashlib.md5(open(self.path, "rb").read()).hexdigest()}
+        return {self.name + "-md5": file_checksum(self.path, "md5")}
 
     def execute(self, cmdline, *args):
         """Does start the executable with meth:`versuchung.execute.shell` and
@@ -218,6 +491,38 @@ class Executable(File):
 
         return shell(self.path + " " + cmdline, *args)
 
+class FileFingerprint(FilesystemObject):
+    """Can be used as: **input parameter**
+
+    References a file or a directory only by its content: the checksum
+    (with the :mod:`hashlib` ``algorithm``) is put into the metadata
+    instead of the path. For directories, all contained files are
+    hashed recursively. Checksums are cached with
+    :func:`file_checksum`, so the content of large, unchanged inputs
+    is hashed only once::
+
+        inputs = {"toolchain": FileFingerprint("/opt/toolchain", algorithm="sha256")}
+
+    """
+
+    def __init__(self, default_filename="", algorithm="sha256"):
+        FilesystemObject.__init__(self, default_filename)
+        self.algorithm = algorithm
+        self.__value = None
+
+    @property
+    def value(self):
+        """:return: string -- checksum of the file or directory"""
+        if self.__value is None:
+            if os.path.isdir(self.path):
+                self.__value = tree_checksum(self.path, self.algorithm)
+            else:
+                self.__value = file_checksum(self.path, self.algorithm)
+        return self.__value
+
+    def inp_metadata(self):
+        return {self.name + "-" + self.algorithm: self.value}
+
 class Directory_op_with:
     def __init__(self):
         self.__olddir = []
@@ -251,66 +556,146 @@ class Directory(FilesystemObject, Directory_op_with):
           # Do something with adjusted current working directory
           print os.curdir
 
+    As input parameter, only the name of the directory is part of the
+    metadata. With ``content_hash=True`` (or the name of a
+    :mod:`hashlib` algorithm), also the :func:`tree_checksum` of the
+    filtered directory contents is added, so the result set changes
+    whenever the contents change::
+
+       inputs = {
+           "sources": Directory("src", filename_filter="*.c", content_hash=True)
+       }
+
     """
 
-    def __init__(self, default_filename="", filename_filter="*"):
+    def __init__(self, default_filename="", filename_filter="*", content_hash=False):
         FilesystemObject.__init__(self, default_filename)
         Directory_op_with.__init__(self)
         self.filename_filter = filename_filter
+        if content_hash is True:
+            content_hash = "sha256"
+        self.content_hash = content_hash
         self.__value = None
+        self.__dirs = set()
         self.__new_files = []
 
     def __ensure_dir_exists(self):
         if not os.path.exists(self.path):
             os.mkdir(self.path)
 
+    def inp_metadata(self):
+        metadata = FilesystemObject.inp_metadata(self)
+        if self.content_hash:
+            metadata[self.name + "-" + self.content_hash] = \
+                tree_checksum(self.path, self.content_hash, self.filename_filter)
+        return metadata
+
     @property
     def value(self):
         """:return: list -- directories and files in given directory"""
         if not self.__value:
-            self.__value = os.listdir(self.path)
-            self.__value = [x for x in self.__value
-                            if fnmatch.fnmatch(x, self.filename_filter)]
+            self.__value = []
+            self.__dirs = set()
+            for entry in os.scandir(self.path):
+                if fnmatch.fnmatch(entry.name, self.filename_filter):
+                    self.__value.append(entry.name)
+                    if entry.is_dir():
+                        self.__dirs.add(entry.name)
         return self.__value
 
+    @staticmethod
+    def __wrap(name, path, is_dir):
+        if is_dir:
+            obj = Directory(name)
+        else:
+            obj = None
+            for cls in versuchung.archives.compressed_file_types.values():
+                if path.endswith(cls.extension):
+                    obj = cls(name)
+            if obj is None:
+                obj = File(name)
+        obj.set_path(os.path.dirname(path), path)
+        return obj
+
     def __iter__(self):
         for name in self.value:
-            p = os.path.join(self.path, name)
             if name in self.subobjects:
                 yield self.subobjects[name]
                 continue
-
-            if os.path.isdir(p):
-                d = Directory(name)
-                d.set_path(self.path, p)
-                self.subobjects[name] = d
-                yield d
-            else:
-                if p.endswith(".gz"):
-                    f = versuchung.archives.GzipFile(name)
-                else:
-                    f = File(name)
-                f.set_path(self.path, p)
-                self.subobjects[name] = f
-                yield f
+            p = os.path.join(self.path, name)
+            obj = self.__wrap(name, p, name in self.__dirs)
+            self.subobjects[name] = obj
+            yield obj
+
+    def scan(self, pattern=None, recursive=False):
+        """Iterate over the directory contents with :func:`os.scandir`.
+
+        In contrast to iterating over the directory itself, the
+        :class:`File`/:class:`Directory` objects are created on the
+        fly and are neither cached nor registered as subobjects, which
+        keeps iterating over directories with many thousand files
+        cheap.
+
+        Without ``recursive``, the entry names are matched against
+        ``pattern`` (the ``filename_filter`` by default). With
+        ``recursive=True``, the whole tree below the filtered entries
+        is scanned and the relative paths are matched against
+        ``pattern``; as with :mod:`fnmatch`, ``*`` also matches
+        slashes::
+
+            for log in self.o.results.scan("*.log", recursive=True):
+                print(log.path)
+        """
+        if pattern is None:
+            pattern = "*" if recursive else self.filename_filter
+        stack = [("", self.path)]
+        while stack:
+            (prefix, path) = stack.pop()
+            with os.scandir(path) as it:
+                entries = list(it)
+            subdirs = []
+            for entry in sorted(entries, key=lambda x: x.name):
+                if not prefix and not fnmatch.fnmatch(entry.name, self.filename_filter):
+                    continue
+                relpath = prefix + entry.name
+                is_dir = entry.is_dir()
+                if fnmatch.fnmatch(relpath, pattern):
+                    obj = self.__wrap(relpath, entry.path, is_dir)
+                    obj.static_experiment = self.static_experiment
+                    obj.dynamic_experiment = self.dynamic_experiment
+                    yield obj
+                if recursive and is_dir and not entry.is_symlink():
+                    subdirs.append((relpath + "/", entry.path))
+            stack += reversed(subdirs)
 
     def before_experiment_run(self, parameter_type):
         FilesystemObject.before_experiment_run(self, parameter_type)
         if parameter_type == "output":
             self.__ensure_dir_exists()
 
-    def new_file(self, name, compressed=False):
+    def new_file(self, name, compressed=False, level=None, streaming=False):
         """Generate a new :class:`~versuchung.files.File` in the
         directory. It will be flushed automatically if the experiment
-        is over."""
+        is over.
+
+        With ``compressed=True``, a
+        :class:`~versuchung.archives.GzipFile` is created. The
+        compression can also be selected by name (``"gzip"``,
+        ``"zstd"`` or ``"lz4"``) together with its ``level``. With
+        ``streaming=True``, the file is written in streaming mode."""
         if not fnmatch.fnmatch(name, self.filename_filter):
             raise RuntimeError("Filename {} does not match filter {}".\
                                  format(name, self.filename_filter))
         self.__ensure_dir_exists()
         if compressed:
-            f = versuchung.archives.GzipFile(name)
+            if compressed is True:
+                compressed = "gzip"
+            if compressed not in versuchung.archives.compressed_file_types:
+                raise RuntimeError("Unknown compression: {}".format(compressed))
+            cls = versuchung.archives.compressed_file_types[compressed]
+            f = cls(name, level=level, streaming=streaming)
         else:
-            f = File(name)
+            f = File(name, streaming=streaming)
         f.set_path(self.path, name)
         f.value = ""
         self.subobjects[name] = f
@@ -330,24 +715,83 @@ class Directory(FilesystemObject, Directory_op_with):
         return f
 
 
-    def mirror_directory(self, path, include_closure = None):
+    # ioctl number of FICLONE on Linux
+    FICLONE = 0x40049409
+
+    @staticmethod
+    def __mirror_file(src, dst, strategy, incremental):
+        if incremental and os.path.exists(dst):
+            (s, d) = (os.stat(src), os.stat(dst))
+            if os.path.samestat(s, d):
+                return
+            if strategy != "hardlink" and s.st_size == d.st_size \
+               and s.st_mtime_ns == d.st_mtime_ns:
+                return
+        # Never write into an existing file, it might be a hardlink
+        if os.path.lexists(dst):
+            os.unlink(dst)
+
+        cloned = False
+        if strategy == "hardlink":
+            try:
+                os.link(src, dst)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+        elif strategy == "reflink":
+            try:
+                import fcntl
+                with open(src, "rb") as s, open(dst, "wb") as d:
+                    fcntl.ioctl(d.fileno(), Directory.FICLONE, s.fileno())
+                cloned = True
+            except (ImportError, IOError, OSError):
+                pass
+
+        if not cloned:
+            shutil.copyfile(src, dst)
+        if incremental:
+            st = os.stat(src)
+            os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    def mirror_directory(self, path, include_closure = None, strategy = "copy",
+                         jobs = 1, incremental = False):
         """Copies the contents of the given directory to this
         directory.
 
         The include closure is a function, which checks for every
         (absolute) path in the origin directory, if it is mirrored. If
-        it is None, all files are included."""
+        it is None, all files are included.
+
+        The ``strategy`` selects how files are mirrored:
+
+        - ``"copy"`` copies the file contents.
+        - ``"hardlink"`` links the files, which costs no additional
+          disk space. The mirrored files must not be modified, since
+          the original files would change as well. Falls back to a copy
+          across filesystems.
+        - ``"reflink"`` clones the files copy-on-write, where the
+          filesystem supports it (e.g. btrfs, XFS). Falls back to a copy.
+
+        With ``jobs`` > 1, the files are mirrored by a thread pool. With
+        ``incremental=True``, files whose size and modification time
+        are unchanged (or that are already hardlinked) are skipped,
+        which makes mirroring into the same directory again cheap.
+        """
+        if strategy not in ("copy", "hardlink", "reflink"):
+            raise RuntimeError("Unknown mirror strategy: " + strategy)
 
         self.__ensure_dir_exists()
 
         if not include_closure:
             include_closure = lambda arg: True
 
-        if not os.path.exists(path) and os.path.isdir(path):
+        if not os.path.isdir(path):
             raise RuntimeError("Argument is no directory")
 
         path = os.path.abspath(path)
 
+        todo = []
         for root, dirs, files in os.walk(path):
             root = root[len(path)+1:]
             for d in dirs:
@@ -362,10 +806,23 @@ class Directory(FilesystemObject, Directory_op_with):
                 if not include_closure(src):
                     continue
                 dst = os.path.join(self.path, root, f)
-                shutil.copyfile(src,dst)
+                todo.append((src, dst))
+
+        mirror = lambda x: self.__mirror_file(x[0], x[1], strategy, incremental)
+        if jobs > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                list(pool.map(mirror, todo))
+        else:
+            for x in todo:
+                mirror(x)
 
         self.__value = None
 
+class StreamAppender:
+    """File-like object that passes all written data to a function"""
+    def __init__(self, function):
+        self.write = function
+
 class CSV_File(File):
     """Can be used as: **input parameter** and **output parameter**
 
@@ -375,7 +832,13 @@ class CSV_File(File):
     to disk.
 
     Internally the :mod:`csv` is used, so all arguments to
-    ``csv.reader`` and ``csv.writer`` can be given in *csv_args*."""
+    ``csv.reader`` and ``csv.writer`` can be given in *csv_args*.
+
+    With ``streaming=True``, :meth:`append` writes every row through
+    a ``csv.writer`` directly into the opened file (see
+    :class:`~versuchung.files.File`), instead of collecting the rows
+    in :attr:`value`. Large csv files can be read row by row with
+    :meth:`iter_rows`."""
 
     value = File.value
     """Other than a normal CSV_File the value of a CSV_File is a list
@@ -385,23 +848,82 @@ class CSV_File(File):
     >>> CSV_File("csv_output").value
     [["1", "2", "3"]]"""
 
-    def __init__(self, default_filename = "", **csv_args):
-        File.__init__(self, default_filename)
+    def __init__(self, default_filename = "", streaming = False, **csv_args):
+        File.__init__(self, default_filename, streaming=streaming)
         self.csv_args = csv_args
+        self.__writer = None
 
     def after_read(self, value):
         fd = StringIO(value)
-        reader = csv.reader(fd, self.csv_args)
+        reader = csv.reader(fd, **self.csv_args)
         return list(reader)
     def before_write(self, value):
+        # Rows that are already formatted by the streaming writer
+        if isinstance(value, str):
+            return value
         fd = StringIO()
-        writer = csv.writer(fd, self.csv_args)
+        writer = csv.writer(fd, **self.csv_args)
         writer.writerows(value)
         return fd.getvalue()
 
     def write(self):
         raise NotImplemented
 
+    def columns(self, names=None, dtypes=None, dataframe=False):
+        """Return the contents of the csv file as typed columns. The
+        file is read from disk row by row (see :meth:`iter_rows`)
+        into one list per column and every column is converted to a
+        :mod:`numpy` array at once.
+
+        :param names: list of column names (default: column indices)
+        :param dtypes: either a single dtype for all columns or a dict
+          from column name to dtype. Columns without a dtype are
+          converted to ``float``, if possible, and stay strings otherwise.
+        :param dataframe: return a ``pandas.DataFrame`` instead
+        :rtype: dict -- column name to ``numpy.ndarray``
+        :raises ValueError: if a row has not as many fields as the others
+
+        >>> CSV_File("csv_output").columns(["a", "b"], dtypes={"b": int})
+        {'a': array([1.5, 2. ]), 'b': array([1, 2])}
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("Please install numpy to use CSV_File.columns()")
+
+        columns = None
+        for lineno, row in enumerate(self.iter_rows(), 1):
+            if columns is None:
+                columns = [[] for _ in row]
+            if len(row) != len(columns):
+                raise ValueError("%s:%d: %d fields, expected %d" % (
+                    self.original_path, lineno, len(row), len(columns)))
+            for column, field in zip(columns, row):
+                column.append(field)
+        if columns is None:
+            columns = []
+        if names is None:
+            names = list(range(len(columns)))
+        assert len(columns) == 0 or len(names) == len(columns), \
+            "%d column names given for %d columns" % (len(names), len(columns))
+
+        ret = {}
+        for idx, name in enumerate(names):
+            column = columns[idx] if columns else []
+            dtype = dtypes.get(name) if type(dtypes) == dict else dtypes
+            if dtype is not None:
+                ret[name] = numpy.asarray(column, dtype=dtype)
+                continue
+            try:
+                ret[name] = numpy.asarray(column, dtype=float)
+            except ValueError:
+                ret[name] = numpy.asarray(column)
+
+        if dataframe:
+            import pandas
+            return pandas.DataFrame(ret, columns=names)
+        return ret
+
     def append(self, row):
         """Append a row to the csv file
 
@@ -413,4 +935,227 @@ class CSV_File(File):
         :type row: list."""
         if type(row) != list:
             raise TypeError("list of values required")
-        self.value.append(row)
+        if not self.streaming:
+            self.value.append(row)
+            return
+        if self.__writer is None:
+            appender = lambda x: File.write(self, x, append=True)
+            self.__writer = csv.writer(StreamAppender(appender), **self.csv_args)
+        self.__writer.writerow(row)
+
+    def open_csv(self):
+        """Open the csv file for reading as text. Subclasses that store
+        the file differently (e.g., compressed) overwrite this method."""
+        return open(self.original_path, newline="")
+
+    def iter_rows(self, columns=None, types=None):
+        """Read the csv file from disk row by row, without keeping it
+        in memory. Rows of an output file that are only in memory are
+        flushed before.
+
+        :param columns: list of column indices that are selected (default: all)
+        :param types: a conversion function for all columns or a list
+          of conversion functions (one for each selected column)
+
+        >>> for (t, cpu) in monitor.iter_rows([0, 1], float):
+        ...     print(t, cpu)
+        """
+        if self.streaming or self.parameter_type == "output":
+            self.flush()
+        with self.open_csv() as fd:
+            for row in csv.reader(fd, **self.csv_args):
+                if columns is not None:
+                    row = [row[i] for i in columns]
+                if callable(types):
+                    row = [types(x) for x in row]
+                elif types is not None:
+                    row = [t(x) for t, x in zip(types, row)]
+                yield row
+
+class ColumnarFile(FilesystemObject):
+    """Can be used as: **input parameter** and **output parameter**
+
+    A table of typed columns in a compact binary format. On disk, it
+    is a directory with a ``schema`` (JSON) and one file of raw
+    :mod:`numpy` data for every column. Rows are appended in batches
+    while the experiment is running; when used as input, the columns
+    are memory-mapped lazily, so only the accessed data is read::
+
+        outputs = {"trace": ColumnarFile("trace", [("time", "f8"), ("latency", "u4")])}
+
+        def run(self):
+            self.trace.append({"time": times, "latency": latencies})
+            self.trace.append([(1.5, 23), (1.6, 42)])
+
+    >>> experiment.i.data.trace["latency"].mean()
+    32.5
+
+    The column dtypes can be omitted, then they are derived from the
+    first appended batch. Columns of Python objects are rejected, and
+    values that do not fit into the (derived) dtype, e.g., floats in
+    an integer column or too long strings, raise a ``ValueError``
+    instead of being truncated. :meth:`to_csv` and :meth:`from_csv` convert
+    from and to :class:`~versuchung.files.CSV_File`.
+    """
+
+    def __init__(self, default_filename="", columns=None):
+        FilesystemObject.__init__(self, default_filename)
+        self.__schema = None
+        if columns is not None:
+            self.__schema = [tuple(c) if type(c) in (tuple, list) else (c, None)
+                             for c in columns]
+        self.__fds = None
+        self.__columns = {}
+        self.__schema_loaded = False
+
+    @staticmethod
+    def __numpy():
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("Please install numpy to use ColumnarFile")
+        return numpy
+
+    def __column_path(self, name):
+        return os.path.join(self.path, "%s.bin" % name)
+
+    @property
+    def schema(self):
+        """:return: list -- tuples of column name and numpy dtype string"""
+        if self.parameter_type != "output" and not self.__schema_loaded:
+            # Existing file: the schema on disk is authoritative
+            with open(os.path.join(self.path, "schema")) as fd:
+                self.__schema = [tuple(x) for x in json.load(fd)["columns"]]
+            self.__schema_loaded = True
+        return self.__schema or []
+
+    @property
+    def names(self):
+        """:return: list -- the column names"""
+        return [name for name, dtype in self.schema]
+
+    def __write_schema(self):
+        with open(os.path.join(self.path, "schema"), "w") as fd:
+            json.dump({"columns": self.__schema, "rows": self.rows}, fd)
+
+    def before_experiment_run(self, parameter_type):
+        FilesystemObject.before_experiment_run(self, parameter_type)
+        if parameter_type == "output" and not os.path.exists(self.path):
+            os.mkdir(self.path)
+
+    def append(self, batch):
+        """Append a batch of rows. The batch is either a dict from
+        column name to a sequence of values (all of the same length)
+        or a list of rows."""
+        numpy = self.__numpy()
+        if type(batch) != dict:
+            names = [name for name, dtype in self.__schema] if self.__schema else None
+            assert names, "ColumnarFile needs column names to append rows"
+            batch = dict(zip(names, zip(*batch))) if batch else {n: [] for n in names}
+        if self.__schema is None:
+            self.__schema = [(name, None) for name in batch]
+        assert set(batch) == set(self.names), \
+            "Columns %s do not match schema %s" % (sorted(batch), self.names)
+
+        arrays = []
+        for name, dtype in self.__schema:
+            array = numpy.asarray(batch[name], dtype=dtype)
+            if array.dtype.hasobject:
+                raise ValueError("Column %s has no fixed-size dtype (%s), declare one in the schema"
+                                 % (name, array.dtype))
+            if dtype is not None and not self.__lossless(batch[name], array):
+                raise ValueError("Values of column %s do not fit into dtype %s"
+                                 % (name, array.dtype.str))
+            arrays.append(array)
+        assert len(set([len(x) for x in arrays])) == 1, "Columns differ in length"
+        self.__schema = [(name, array.dtype.str)
+                         for (name, dtype), array in zip(self.__schema, arrays)]
+
+        if self.__fds is None:
+            self.__fds = {name: open(self.__column_path(name), "ab")
+                          for name in self.names}
+            self.__write_schema()
+        for (name, dtype), array in zip(self.__schema, arrays):
+            self.__fds[name].write(array.tobytes())
+        self.__columns = {}
+
+    @classmethod
+    def __lossless(cls, values, array):
+        """Check that the conversion of the values to array did not
+        change them. numpy silently truncates floats and strings."""
+        numpy = cls.__numpy()
+        natural = numpy.asarray(values)
+        if numpy.can_cast(natural.dtype, array.dtype) or natural.dtype.hasobject:
+            return True
+        if natural.dtype.kind == array.dtype.kind and array.dtype.kind in "fc":
+            # A smaller float dtype is declared for its precision
+            return True
+        if natural.dtype.kind in "SU" and array.dtype.kind not in "SU":
+            # Parsed numbers, invalid literals already failed
+            return True
+        return numpy.array_equal(array.astype(natural.dtype), natural,
+                                 equal_nan=natural.dtype.kind in "fc")
+
+    def flush(self):
+        """Write the appended batches to disk"""
+        if self.__fds is not None:
+            for fd in self.__fds.values():
+                fd.flush()
+            self.__write_schema()
+
+    def after_experiment_run(self, parameter_type):
+        FilesystemObject.after_experiment_run(self, parameter_type)
+        if parameter_type == "output" and self.__fds is not None:
+            self.flush()
+            for fd in self.__fds.values():
+                fd.close()
+            self.__fds = None
+
+    def __getitem__(self, name):
+        """The column as (memory-mapped) ``numpy.ndarray``"""
+        if name not in self.__columns:
+            numpy = self.__numpy()
+            dtype = numpy.dtype(dict(self.schema)[name])
+            path = self.__column_path(name)
+            if self.__fds is not None:
+                self.__fds[name].flush()
+            if os.path.getsize(path) == 0:
+                self.__columns[name] = numpy.empty(0, dtype=dtype)
+            else:
+                self.__columns[name] = numpy.memmap(path, dtype=dtype, mode="r")
+        return self.__columns[name]
+
+    @property
+    def rows(self):
+        """:return: int -- number of rows"""
+        if not self.schema:
+            return 0
+        name, dtype = self.schema[0]
+        if dtype is None:
+            return 0
+        if self.__fds is not None:
+            self.__fds[name].flush()
+        return os.path.getsize(self.__column_path(name)) // self.__numpy().dtype(dtype).itemsize
+
+    @property
+    def value(self):
+        """:return: dict -- column name to (memory-mapped) ``numpy.ndarray``"""
+        return {name: self[name] for name in self.names}
+
+    def to_csv(self, csv_file):
+        """Append all rows to the given :class:`~versuchung.files.CSV_File`"""
+        columns = [self[name] for name in self.names]
+        for row in zip(*columns):
+            csv_file.append([x.item() for x in row])
+
+    def from_csv(self, csv_file):
+        """Append all rows of the given
+        :class:`~versuchung.files.CSV_File`. The csv text is converted
+        to the dtypes of the schema."""
+        dtypes, names = None, None
+        if self.__schema:
+            # Pass the text, append() checks the conversion
+            dtypes = {name: str for (name, dtype) in self.__schema if dtype is not None}
+            names = self.names
+        columns = csv_file.columns(names, dtypes=dtypes)
+        self.append({str(k): v for k, v in columns.items()})
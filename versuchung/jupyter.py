@@ -27,11 +27,12 @@ class JupyterExperiment(Experiment):
             self._globals = globals
             args = args + self._globals.get('versuchung_args', [])
             self.execute_setup(args)
+
+      def end(self):
+            self.execute_teardown()
+            # Only now, the result set is at its final location
             out = self._globals.get('versuchung_path')
             if out:
                   with open(out, "w+") as fd:
                         fd.write(self.path)
 
-      def end(self):
-            self.execute_teardown()
-
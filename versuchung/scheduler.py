@@ -0,0 +1,191 @@
+# This file is part of versuchung.
+#
+# versuchung is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# versuchung is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# versuchung.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+from versuchung.experiment import Experiment, ExperimentError, ExecutionPool, LambdaType
+import logging
+import os
+
+class Job:
+    """A node in the experiment dependency graph. It consists of an
+    experiment class and the keyword arguments for
+    :meth:`~versuchung.experiment.Experiment.execute`. Input
+    parameters that are experiments can be given as another
+    :class:`Job` (or a list of jobs for a :class:`~versuchung.types.List`
+    of experiments)::
+
+        producer = Job(SimpleExperiment, input_key="foo")
+        consumer = Job(SimpleExperiment2, se=producer)
+        schedule(consumer, jobs=4)
+    """
+
+    def __init__(self, experiment_type, **kwargs):
+        if isinstance(experiment_type, Experiment):
+            experiment_type = type(experiment_type)
+        self.experiment_type = experiment_type
+        self.kwargs = kwargs
+        self.kwargs.setdefault("reuse", True)
+        self.identifier = None
+
+    @property
+    def path(self):
+        """:return: string -- absolute path to the result set, once the job is done"""
+        if not self.identifier:
+            return None
+        return os.path.abspath(os.path.join(self.kwargs.get("base_dir", "."),
+                                            self.identifier))
+
+    def dependencies(self, default_jobs):
+        """Walk the inputs of the experiment and return all jobs it
+        depends on. Experiment inputs that are not given and have no
+        existing default result set are produced with a default job
+        from ``default_jobs`` (a dict from experiment type to job)."""
+        deps = []
+        for (name, inp) in self.experiment_type.inputs.items():
+            if name in self.kwargs:
+                value = self.kwargs[name]
+                values = value if type(value) in (list, tuple) else [value]
+                deps += [x for x in values if isinstance(x, Job)]
+            elif isinstance(inp, Experiment) and not inp.experiment_identifier:
+                t = type(inp)
+                if t not in default_jobs:
+                    default_jobs[t] = Job(t)
+                self.kwargs[name] = default_jobs[t]
+                deps.append(default_jobs[t])
+        return deps
+
+    def has_lambda_inputs(self):
+        """Lambda inputs are resolved when the experiment is started,
+        so their dependencies are unknown beforehand."""
+        return any(type(inp) == LambdaType
+                   for inp in self.experiment_type.inputs.values())
+
+    def execute_kwargs(self):
+        """The keyword arguments with all jobs replaced by the path of their result set"""
+        kwargs = {}
+        for (name, value) in self.kwargs.items():
+            if isinstance(value, Job):
+                value = value.path
+            elif type(value) in (list, tuple):
+                value = [x.path if isinstance(x, Job) else x for x in value]
+            kwargs[name] = value
+        return kwargs
+
+    def __repr__(self):
+        return "<Job %s %s>" % (self.experiment_type.__name__, self.kwargs)
+
+
+def dependency_graph(target):
+    """Build the dependency graph for a :class:`Job`.
+
+    Jobs with lambda inputs depend on all jobs that are not
+    (transitively) depending on them, since the lambda might search
+    for their results.
+
+    :return: dict -- map from job to the set of jobs it depends on"""
+    default_jobs = {}
+    graph = {}
+    order = []
+    stack = [target]
+    while stack:
+        job = stack.pop()
+        if job in graph:
+            continue
+        graph[job] = set(job.dependencies(default_jobs))
+        order.append(job)
+        stack += list(graph[job])
+
+    def upstream(job):
+        seen = set()
+        stack = [job]
+        while stack:
+            for dep in graph[stack.pop()]:
+                if dep not in seen:
+                    seen.add(dep)
+                    stack.append(dep)
+        return seen
+
+    # Ensure a deterministic order: producers first
+    order.reverse()
+    lambda_jobs = [job for job in order if job.has_lambda_inputs()]
+    for job in lambda_jobs:
+        for other in order:
+            if other is job or job in upstream(other):
+                continue
+            if other.has_lambda_inputs() and \
+               lambda_jobs.index(other) > lambda_jobs.index(job):
+                continue
+            graph[job].add(other)
+    return graph
+
+
+def schedule(target, jobs=None, **kwargs):
+    """Execute an experiment together with all experiments it depends
+    on. The ``target`` is either a :class:`Job` or an experiment
+    class, which is wrapped into a job with the given keyword
+    arguments.
+
+    All producers are executed before their consumers. Independent
+    jobs are executed in parallel with at most ``jobs`` worker
+    processes (see :class:`~versuchung.experiment.ExecutionPool`).
+    Every job is executed with ``reuse=True`` (unless overridden), so
+    producers whose result set already exists are not calculated
+    again. If a job fails, all jobs depending on it are skipped.
+
+    >>> schedule(SimpleExperiment2, jobs=4, se=Job(SimpleExperiment, input_key="foo"))
+    'SimpleExperiment2-...'
+
+    :return: string -- result set identifier of the target
+    :raises: :exc:`~versuchung.experiment.ExperimentError`, if the target could not be executed
+    """
+    if not isinstance(target, Job):
+        target = Job(target, **kwargs)
+
+    graph = dependency_graph(target)
+    pending = list(graph.keys())
+    failed = set()
+    done = set()
+    pool = ExecutionPool(jobs)
+
+    def collect():
+        (job, identifier, error) = pool.wait()
+        if error:
+            logging.error("%s failed: %s", job, error)
+            failed.add(job)
+        else:
+            job.identifier = identifier
+            done.add(job)
+
+    while pending or len(pool) > 0:
+        progress = False
+        for job in list(pending):
+            deps = graph[job]
+            if deps & failed:
+                logging.error("%s skipped, a dependency failed", job)
+                failed.add(job)
+                pending.remove(job)
+                progress = True
+            elif deps <= done and not pool.full():
+                pending.remove(job)
+                pool.submit(job, job.experiment_type(), job.execute_kwargs())
+                progress = True
+        if len(pool) > 0:
+            collect()
+        elif not progress:
+            raise ExperimentError("Dependency cycle between %s" % pending)
+
+    if target in failed:
+        raise ExperimentError("%s could not be executed" % target)
+    return target.identifier
@@ -42,11 +42,13 @@ class Macros(File):
     \\newcommand{\\MyNewTexMacro} {23}
 
     """
-    def __init__(self, filename = "data.tex"):
+    def __init__(self, filename = "data.tex", streaming = False):
         """Define tex macros directly as output of a experiment.
 
-        Use this only as output parameter!."""
-        File.__init__(self, filename)
+        Use this only as output parameter!. With ``streaming=True``
+        every macro is written to disk immediately (see
+        :class:`~versuchung.files.File`)."""
+        File.__init__(self, filename, streaming=streaming)
 
     def macro(self, macro, value):
         """Define a new tex macro with \\\\newcommand. This will result in::
@@ -12,6 +12,7 @@
 # You should have received a copy of the GNU General Public License along with
 # versuchung.  If not, see <http://www.gnu.org/licenses/>.
 
+import inspect
 import logging
 import sys
 from functools import wraps
@@ -68,9 +69,24 @@ class AdviceManager(Singleton):
                 return func(*args, **kwargs)
         return wrapped
 
+    def async_around_wrapper(self, func, last = None):
+        async def wrapped(args, kwargs):
+            if last:
+                ret = func(last, args, kwargs)
+            else:
+                ret = func(*args, **kwargs)
+            if inspect.isawaitable(ret):
+                ret = await ret
+            return ret
+        return wrapped
+
     @staticmethod
     def advicable(func):
-        """Decorator to mark a function as advicable"""
+        """Decorator to mark a function as advicable. Coroutine
+        functions stay coroutine functions: their around advices get
+        a coroutine function as first argument and may be coroutine
+        functions themselves, and the after advices get the awaited
+        result."""
         if not "__call__" in dir(func):
             raise ValueError("No function adviced")
         full_name = "%s.%s" % (func.__module__, func.__name__)
@@ -103,6 +119,28 @@ class AdviceManager(Singleton):
                 ret = f(ret)
 
             return ret
+
+        async def async_wrapped(*args, **kwargs):
+            am = AdviceManager()
+            for f in am.before[full_name]:
+                ret = f(args, kwargs)
+                if ret:
+                    (args, kwargs) = ret
+
+            func_ = am.async_around_wrapper(func, None)
+            for f in am.around[full_name]:
+                func_ = am.async_around_wrapper(f, func_)
+            ret = await func_(args, kwargs)
+
+            for f in am.after[full_name]:
+                ret = f(ret)
+                if inspect.isawaitable(ret):
+                    ret = await ret
+
+            return ret
+
+        if inspect.iscoroutinefunction(func):
+            wrapped = async_wrapped
         wrapped.__doc__ = func.__doc__
         return wrapped
 
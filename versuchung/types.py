@@ -33,14 +33,16 @@ class SubObjects(dict):
         assert not key in self or self[key] == value, "Duplicated object name: %s = %s" % (key, value)
         dict.__setitem__(self, key, value)
         value.parent_object = self.parent
-        self.update()
+        # Only the new object has to be updated, updating all objects
+        # would make inserting N objects O(N^2).
+        self.update([(key, value)])
 
-    def update(self):
+    def update(self, items=None):
         if not "parent" in dir(self) and len(self) > 0:
             print("You probably used python multiprocessing, this might break horrible")
             return
 
-        for name, obj in self.items():
+        for name, obj in (items or self.items()):
             if self.parent.name != None:
                 obj.name = "%s-%s" % (self.parent.name, name)
             else: